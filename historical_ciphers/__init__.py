@@ -12,4 +12,5 @@
 #                         ╚██████╗██║██║     ██║  ██║███████╗██║  ██║███████║
 #                          ╚═════╝╚═╝╚═╝     ╚═╝  ╚═╝╚══════╝╚═╝  ╚═╝╚══════╝
 
-from historical_ciphers import *
\ No newline at end of file
+from .historical_ciphers import *
+from .historical_ciphers import __getattr__
\ No newline at end of file
@@ -0,0 +1,199 @@
+# Benchmarks for historical_ciphers. Run from this directory, like tests.py:
+#
+#     python benchmarks.py --output results.json
+#
+# Measures encrypt/decrypt throughput for every Cipher subclass across input
+# sizes, wall time of each hack() across ciphertext lengths, and calls per
+# second of the language scorers. Results are written as JSON so that runs
+# can be compared; see --compare.
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+from historical_ciphers import *
+
+SAMPLE_TEXT = """It was the best of times, it was the worst of times, it was the
+age of wisdom, it was the age of foolishness, it was the epoch of belief, it
+was the epoch of incredulity, it was the season of Light, it was the season
+of Darkness, it was the spring of hope, it was the winter of despair, we had
+everything before us, we had nothing before us, we were all going direct to
+Heaven, we were all going direct the other way. """
+SAMPLE_WORDS = set(word.strip(',.').upper() for word in SAMPLE_TEXT.split())
+
+KB = 1 << 10
+MB = 1 << 20
+THROUGHPUT_SIZES = [KB, 10 * KB, 100 * KB, MB, 10 * MB, 100 * MB]
+HACK_LENGTHS = [256, 1 * KB, 4 * KB]
+SCORER_LENGTHS = [64, 1 * KB]
+
+CIPHER_KEYS = {
+    Caesar: 8,
+    Transposition: 8,
+    Affine: 3399,
+    Substitution: Substitution.gen_key(random.Random(0)),
+    Vegenere: 'LEMON',
+}
+
+
+def sample(length):
+    ''' Returns length characters of repeated sample text. '''
+    repeats = length // len(SAMPLE_TEXT) + 1
+    return (SAMPLE_TEXT * repeats)[:length]
+
+
+def best_time(function, repeat):
+    ''' Returns the fastest of repeat wall-clock timings of function(). '''
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench_throughput(sizes, repeat):
+    ''' Returns encrypt/decrypt throughput records for each cipher. '''
+    records = []
+    for size in sizes:
+        message = sample(size)
+        for cipher, key in CIPHER_KEYS.items():
+            instance = cipher(key=key)
+            ciphertext = instance.encrypt(message)
+            for operation, text, method in (
+                    ('encrypt', message, instance.encrypt),
+                    ('decrypt', ciphertext, instance.decrypt)):
+                seconds = best_time(lambda: method(text), repeat)
+                records.append({'cipher': cipher.__name__,
+                                'operation': operation,
+                                'size': size,
+                                'seconds': seconds,
+                                'mb_per_second': size / MB / seconds})
+    return records
+
+
+def hackers():
+    ''' Returns a function per hackable cipher that hacks an instance.
+        Substitution hill-climbs on a model of the sample text, seeded so
+        every run does the same work. '''
+    model = QuadgramModel.from_text(sample(16 * KB), Substitution.CHARS)
+
+    def dictionary_hack(instance):
+        return instance.hack(SAMPLE_WORDS)
+
+    def model_hack(instance):
+        return instance.hack(model, restarts=1, seed=0)
+    return {Caesar: dictionary_hack, Transposition: dictionary_hack,
+            Affine: dictionary_hack, Substitution: model_hack,
+            Vegenere: dictionary_hack}
+
+
+def bench_hacks(lengths, repeat):
+    ''' Returns hack() wall time records for each hackable cipher. '''
+    records = []
+    hacks = hackers()
+    for length in lengths:
+        message = sample(length)
+        for cipher, hack in hacks.items():
+            ciphertext = cipher(message, key=CIPHER_KEYS[cipher]).ciphertext
+            instance = cipher(ciphertext=ciphertext)
+            seconds = best_time(lambda: hack(instance), repeat)
+            records.append({'cipher': cipher.__name__,
+                            'length': length,
+                            'seconds': seconds})
+    return records
+
+
+def bench_scorers(lengths, calls):
+    ''' Returns calls per second of is_language() and words_in_dict(), on
+        both English and garbage candidates. '''
+    records = []
+    for length in lengths:
+        english = sample(length)
+        garbage = Affine(english, key=3399).ciphertext
+        for scorer in (is_language, words_in_dict):
+            for kind, text in (('english', english), ('garbage', garbage)):
+                start = time.perf_counter()
+                for _ in range(calls):
+                    scorer(text, SAMPLE_WORDS)
+                seconds = time.perf_counter() - start
+                records.append({'scorer': scorer.__name__,
+                                'candidate': kind,
+                                'length': length,
+                                'calls_per_second': calls / seconds})
+    return records
+
+
+def compare(baseline, current, threshold):
+    ''' Returns descriptions of timings in current that are more than
+        threshold (a fraction) slower than the same timing in baseline.
+        Scorer rates are compared as seconds per call. '''
+    measures = ('seconds', 'mb_per_second', 'calls_per_second')
+
+    def timings(results):
+        for section in ('throughput', 'hack', 'scorers'):
+            for record in results.get(section, []):
+                label = tuple(sorted((name, value)
+                                     for name, value in record.items()
+                                     if name not in measures))
+                if 'calls_per_second' in record:
+                    seconds = 1 / record['calls_per_second']
+                else:
+                    seconds = record['seconds']
+                yield (section,) + label, seconds
+
+    old = dict(timings(baseline))
+    regressions = []
+    for label, seconds in timings(current):
+        if label in old and seconds > old[label] * (1 + threshold):
+            regressions.append('{}: {:.6f}s -> {:.6f}s'.format(
+                label, old[label], seconds))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark historical_ciphers.')
+    parser.add_argument('--output', help='write JSON results to this file')
+    parser.add_argument('--max-size', type=int, default=100 * MB,
+                        help='largest throughput input, in bytes')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='timings per measurement; the best is kept')
+    parser.add_argument('--scorer-calls', type=int, default=1000)
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='JSON results to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='slowdown fraction reported as a regression')
+    args = parser.parse_args(argv)
+
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': numpy is not None,
+        'throughput': bench_throughput(
+            [size for size in THROUGHPUT_SIZES if size <= args.max_size],
+            args.repeat),
+        'hack': bench_hacks(HACK_LENGTHS, args.repeat),
+        'scorers': bench_scorers(SCORER_LENGTHS, args.scorer_calls),
+    }
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as fo:
+            fo.write(report + '\n')
+    else:
+        print(report)
+
+    if args.compare:
+        with open(args.compare) as fo:
+            regressions = compare(json.load(fo), results, args.threshold)
+        for regression in regressions:
+            print('Regression:', regression, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,213 @@
+# Command line tool for historical_ciphers, installed as historical-ciphers:
+#
+#     historical-ciphers encrypt --cipher vegenere --key LEMON letters/ -o out/
+#     historical-ciphers crack --cipher affine < secret.txt
+#
+# Inputs are files, directories (every file under them), or stdin when no
+# path or '-' is given. With several inputs, files are spread over a
+# process pool. Each output file is written with a single buffered write;
+# without --output, results go to stdout. The dictionary is loaded only by
+# crack, once per process, so encrypt and decrypt start straight away.
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from historical_ciphers import *
+
+CIPHERS = {cipher.__name__.lower(): cipher
+           for cipher in (Caesar, Transposition, Affine, Substitution,
+                          Vegenere)}
+INT_KEYS = (Caesar, Transposition, Affine)
+# Write buffer for output files.
+WRITE_BUFFER = 1 << 20
+
+
+def parse_key(cipher, key):
+    ''' Returns command line key as cipher expects it. '''
+    if key is None:
+        return None
+    return int(key) if cipher in INT_KEYS else key
+
+
+def find_files(paths):
+    ''' Returns (path, relative name) for every file in paths, walking
+        directories. '''
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in sorted(names):
+                    full = os.path.join(root, name)
+                    files.append((full, os.path.relpath(full, path)))
+        else:
+            files.append((path, os.path.basename(path)))
+    return files
+
+
+@lru_cache(maxsize=None)
+def open_cache(path):
+    ''' Returns the HackCache backed by path, opened once per process. '''
+    return HackCache(path=path)
+
+
+def key_problem(command, cipher, key, text):
+    ''' Returns why key cannot encrypt or decrypt text with cipher, or None
+        if it can. Checked here so the cipher never prints a warning into
+        the output stream. '''
+    if cipher is Affine:
+        mult_key = key // len(Affine.CHARS)
+        if gcd(mult_key, len(Affine.CHARS)) != 1:
+            return 'its multiplication key {} has no inverse mod {}'.format(
+                mult_key, len(Affine.CHARS))
+    if cipher is Transposition and command == 'encrypt' and (
+            key >= len(text) / 2):
+        return 'it is not less than half the text length'
+    return None
+
+
+def crack_file_problem(cipher, dictionary, model):
+    ''' Returns why crack cannot read the dictionary or model it needs, or
+        None if it can. '''
+    if cipher is Substitution and model:
+        needed = model
+    else:
+        needed = (dictionary or os.environ.get(DICTIONARY_VARIABLE) or
+                  'dictionary.txt')
+    if not os.path.isfile(needed):
+        return 'cannot read {}; pass --dictionary{}.'.format(
+            needed, ' or --model' if cipher is Substitution else '')
+    return None
+
+
+def run(command, cipher, key, text, dictionary=None, model=None,
+        cache=None):
+    ''' Returns (output text, note, ok) for command on text. note reports
+        the key a crack found, or why there is no output text; ok is False
+        if command failed. cache is the path of a HackCache database for
+        cracks. '''
+    if command in ('encrypt', 'decrypt'):
+        problem = key_problem(command, cipher, key, text)
+        if problem:
+            return None, 'cannot {} with key {!r}: {}'.format(
+                command, key, problem), False
+        return cipher.transformer(key, command == 'decrypt')(text), None, True
+
+    instance = cipher(ciphertext=text)
+    if cipher is Substitution:
+        if model:
+            results = instance.hack(QuadgramModel.load(model))
+        else:
+            results = instance.hack(
+                dictionary=english_dictionary(dictionary))
+    else:
+        results = instance.hack(english_dictionary(dictionary),
+                                cache=open_cache(cache) if cache else None)
+    if not results:
+        return None, 'no key found', False
+    best = results[0]
+    note = 'key {!r}, score {:.3f}'.format(best.key, best.score)
+    return instance.decrypt(passed_key=best.key), note, True
+
+
+def run_file(task):
+    ''' Runs one file; task is (command, cipher, key, source, target,
+        dictionary, model, cache). Returns (source, note, ok). Worker
+        processes. '''
+    command, cipher, key, source, target, dictionary, model, cache = task
+    with open(source, newline='', errors='surrogateescape') as fo:
+        text = fo.read()
+    output, note, ok = run(command, cipher, key, text, dictionary, model,
+                           cache)
+    if output is not None:
+        directory = os.path.dirname(target)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(target, 'w', newline='', errors='surrogateescape',
+                  buffering=WRITE_BUFFER) as fo:
+            fo.write(output)
+    return source, note, ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='historical-ciphers',
+        description='Encrypt, decrypt, or crack files with historical '
+                    'ciphers.')
+    parser.add_argument('command', choices=('encrypt', 'decrypt', 'crack'))
+    parser.add_argument('paths', nargs='*', metavar='PATH',
+                        help="files or directories; stdin if none or '-'")
+    parser.add_argument('-c', '--cipher', required=True,
+                        choices=sorted(CIPHERS))
+    parser.add_argument('-k', '--key', help='required to encrypt or decrypt')
+    parser.add_argument('-o', '--output', metavar='DIRECTORY',
+                        help='write one output file per input here')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(),
+                        help='processes for several inputs')
+    parser.add_argument('-d', '--dictionary',
+                        help='dictionary file for crack (default: ${})'.format(
+                            DICTIONARY_VARIABLE))
+    parser.add_argument('-m', '--model',
+                        help='QuadgramModel file for cracking substitution')
+    parser.add_argument('--cache', metavar='DATABASE',
+                        help='sqlite3 file of crack results to reuse')
+    args = parser.parse_intermixed_args(argv)
+
+    cipher = CIPHERS[args.cipher]
+    try:
+        key = parse_key(cipher, args.key)
+    except ValueError:
+        parser.error('--key for {} must be an integer.'.format(args.cipher))
+    if args.command != 'crack' and not key:
+        parser.error('{} needs --key.'.format(args.command))
+    if args.command == 'crack':
+        problem = crack_file_problem(cipher, args.dictionary, args.model)
+        if problem:
+            parser.error(problem)
+
+    if not args.paths or args.paths == ['-']:
+        output, note, ok = run(args.command, cipher, key, sys.stdin.read(),
+                               args.dictionary, args.model, args.cache)
+        if note:
+            print(note, file=sys.stderr)
+        if not ok:
+            return 1
+        sys.stdout.write(output)
+        return 0
+
+    files = find_files(args.paths)
+    if args.output is None:
+        if len(files) > 1:
+            parser.error('--output is needed for several inputs.')
+        # One input, no output directory: run here and print.
+        with open(files[0][0], newline='', errors='surrogateescape') as fo:
+            output, note, ok = run(args.command, cipher, key, fo.read(),
+                                   args.dictionary, args.model, args.cache)
+        if note:
+            print('{}: {}'.format(files[0][0], note), file=sys.stderr)
+        if not ok:
+            return 1
+        sys.stdout.write(output)
+        return 0
+
+    tasks = [(args.command, cipher, key, source,
+              os.path.join(args.output, name), args.dictionary, args.model,
+              args.cache)
+             for source, name in files]
+    if args.workers and args.workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            results = list(executor.map(run_file, tasks))
+    else:
+        results = [run_file(task) for task in tasks]
+    failed = 0
+    for source, note, ok in results:
+        if note:
+            print('{}: {}'.format(source, note), file=sys.stderr)
+        failed += not ok
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
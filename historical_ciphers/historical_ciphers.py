@@ -1,11 +1,30 @@
 # Classes for historical, insecure ciphers. Have fun.
 # IRGYYKY LUX NOYZUXOIGR, OTYKIAXK IOVNKXY. NGBK LAT.
 
-from itertools import cycle
+from array import array
+from collections import Counter, OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from itertools import cycle, islice
+from operator import itemgetter
 
+import heapq
 import math
+import mmap
+import os
 import string
 import random
+import struct
+import threading
+import time
+import weakref
+import zlib
+
+# NumPy is optional; it backs the vectorized Vegenère path for large texts.
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 # Functions for multiplicative/Affine cipher.
 # Calculates greatest common denominator; uses Euclid's algorithm. In 3.5
@@ -18,6 +37,8 @@ def gcd(a, b):
 
 
 # Calculates modular inverse of two numbers; uses Euclid's extended algorithm.
+# Results are cached, since the same few moduli come up again and again.
+@lru_cache(maxsize=4096)
 def mod_inverse(a, m):
     ''' Return modular inverse of two ints.'''
     if gcd(a, m) != 1:
@@ -30,9 +51,24 @@ def mod_inverse(a, m):
     return u1 % m
 
 
+# Valid multiplication keys, computed once per alphabet length, so key
+# generation samples them directly instead of rejecting invalid draws.
+@lru_cache(maxsize=16)
+def affine_multipliers(length):
+    ''' Returns tuple of the units mod length from 2 up, which are the
+        valid multiplication keys for an alphabet of length characters. '''
+    return tuple(mult_key for mult_key in range(2, length)
+                 if gcd(mult_key, length) == 1)
+
+
 def load_dictionary(file_name=None):
-    ''' Return a set of uppercase words from file, splitting on \\n.'''
+    ''' Return a set of uppercase words from file, splitting on \\n. If the
+        file was written by compile_dictionary(), return a memory-mapped
+        CompiledDictionary instead.'''
     dict_name = file_name or 'dictionary.txt'
+    with open(dict_name, 'rb') as fo:
+        if fo.read(len(CompiledDictionary.MAGIC)) == CompiledDictionary.MAGIC:
+            return CompiledDictionary(dict_name)
     dict_words = set()
     with open(dict_name) as fo:
         for word in fo.read().split('\n'):
@@ -40,15 +76,322 @@ def load_dictionary(file_name=None):
     return dict_words
 
 
+# The default dictionary for hacks, loaded on first use and then kept, so
+# importing the module or encrypting never reads it. Its file is named by
+# the DICTIONARY_VARIABLE environment variable, or is dictionary.txt.
+# english_dict, the module attribute, is the same dictionary.
+DICTIONARY_VARIABLE = 'HISTORICAL_CIPHERS_DICTIONARY'
+
+
+@lru_cache(maxsize=None)
+def english_dictionary(file_name=None):
+    ''' Returns load_dictionary(file_name), loading each file once per
+        process; file_name defaults as described above. '''
+    return load_dictionary(file_name or os.environ.get(DICTIONARY_VARIABLE))
+
+
+def __getattr__(name):
+    ''' Loads english_dict lazily; see english_dictionary(). '''
+    if name == 'english_dict':
+        return english_dictionary()
+    raise AttributeError('module {!r} has no attribute {!r}'.format(
+        __name__, name))
+
+
+# Compiled dictionaries. compile_dictionary() writes the uppercased words of
+# a plain dictionary file into one binary file: a header, an offsets array
+# into a sorted word blob, an open-addressing hash index over the words
+# (crc32, linear probing), and a table of letter-bigram log probabilities.
+# CompiledDictionary memory-maps that file, so loading it does no parsing.
+# Single lookups probe the index in place; is_language() checks whole
+# candidates against a frozenset of the words, built from the map on first
+# use, since set lookups are about ten times faster than probing the index
+# from Python. That set is nearly as large as a plain dictionary's, so a
+# hack saves the parse at load, not memory. Words that are not ASCII are
+# left out rather than mangled.
+def compile_dictionary(source, target):
+    ''' Compiles plain dictionary file source, one word per line, into
+        target, skipping words that are not ASCII. Returns the number of
+        words written. '''
+    with open(source) as fo:
+        words = sorted(set(word.upper().encode('ascii')
+                           for word in fo.read().split('\n')
+                           if word.isascii()) - {b''})
+
+    offsets = array('I', [0])
+    for word in words:
+        offsets.append(offsets[-1] + len(word))
+
+    slot_count = 1 << max(len(words) * 2, 1).bit_length()
+    slots = array('I', bytes(4 * slot_count))
+    for index, word in enumerate(words, 1):
+        slot = zlib.crc32(word) & (slot_count - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (slot_count - 1)
+        slots[slot] = index
+
+    bigrams = bigram_log_probs(words)
+
+    with open(target, 'wb') as fo:
+        fo.write(CompiledDictionary.MAGIC)
+        fo.write(struct.pack(CompiledDictionary.HEADER, len(words),
+                             slot_count, offsets[-1]))
+        fo.write(offsets.tobytes())
+        fo.write(slots.tobytes())
+        fo.write(bigrams.tobytes())
+        fo.write(b''.join(words))
+    return len(words)
+
+
+def bigram_log_probs(words):
+    ''' Returns array of 27 * 27 letter-bigram log probabilities over
+        words, uppercase bytes, each padded with word boundaries; first *
+        27 + second indexes a bigram. Index 0 is the boundary and 1 to 26
+        are A to Z. Counts are add-one smoothed. Words never hold two
+        boundaries in a row, but text does (', ', '.\n'), so a run of
+        boundaries is scored as one: boundary to boundary is 0. '''
+    counts = [[1] * 27 for _ in range(27)]
+    for word in words:
+        letters = [0] + [char - 64 for char in word if 65 <= char <= 90] + [0]
+        for first, second in zip(letters, letters[1:]):
+            counts[first][second] += 1
+    bigrams = array('d')
+    for row in counts:
+        total = sum(row)
+        bigrams.extend(math.log(count / total) for count in row)
+    bigrams[0] = 0.0
+    return bigrams
+
+
+def dictionary_bigrams(dictionary):
+    ''' Returns bigram_log_probs() for dictionary, precomputed if it is a
+        CompiledDictionary. '''
+    if isinstance(dictionary, CompiledDictionary):
+        return dictionary.bigrams
+    return bigram_log_probs(word.upper().encode('ascii')
+                            for word in dictionary
+                            if word and word.isascii())
+
+
+def bigram_score(text, bigrams):
+    ''' Returns the mean letter-bigram log probability of text, where
+        bigrams is from bigram_log_probs() and anything that is not an
+        ASCII letter is a word boundary. Higher is more language-like. '''
+    data = text.encode('ascii', 'replace').upper().translate(_BIGRAM_INDEX)
+    if len(data) < 2:
+        return float('-inf')
+    return sum(bigrams[first * 27 + second]
+               for first, second in zip(data, data[1:])) / (len(data) - 1)
+
+
+class CompiledDictionary:
+    ''' Read-only, memory-mapped dictionary written by compile_dictionary().
+        Supports `in` for str and ASCII bytes words, len(), and iteration,
+        which yields the words as uppercase str in sorted order. The file
+        uses native byte order, so compile it on the machine that reads it. '''
+    MAGIC = b'HCDICT1\x00'
+    HEADER = '=III'
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        with open(file_name, 'rb') as fo:
+            self._map = mmap.mmap(fo.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = view = memoryview(self._map)
+        start = len(self.MAGIC)
+        word_count, slot_count, blob_size = struct.unpack_from(
+            self.HEADER, self._map, start)
+        start += struct.calcsize(self.HEADER)
+        self._offsets = view[start:start + 4 * (word_count + 1)].cast('I')
+        start += 4 * (word_count + 1)
+        self._slots = view[start:start + 4 * slot_count].cast('I')
+        start += 4 * slot_count
+        self.bigrams = view[start:start + 8 * 27 * 27].cast('d')
+        start += 8 * 27 * 27
+        self._blob = view[start:start + blob_size]
+        self._mask = slot_count - 1
+        self._word_count = word_count
+        self._words = None
+
+    def __len__(self):
+        return self._word_count
+
+    def __iter__(self):
+        blob, offsets = bytes(self._blob), self._offsets
+        for index in range(self._word_count):
+            yield blob[offsets[index]:offsets[index + 1]].decode('ascii')
+
+    @property
+    def words(self):
+        ''' frozenset of the words as uppercase ASCII bytes, built on first
+            use and kept; see the comment above compile_dictionary(). '''
+        if self._words is None:
+            blob, offsets = bytes(self._blob), self._offsets
+            self._words = frozenset(blob[offsets[index]:offsets[index + 1]]
+                                    for index in range(self._word_count))
+        return self._words
+
+    def __reduce__(self):
+        # Pickle by file name; each process maps the file itself.
+        return CompiledDictionary, (self.file_name,)
+
+    def close(self):
+        ''' Releases the memory map. The dictionary is unusable after. '''
+        for view in (self._offsets, self._slots, self.bigrams, self._blob,
+                     self._view):
+            view.release()
+        self._map.close()
+        self._words = None
+
+    def __contains__(self, word):
+        if isinstance(word, str):
+            try:
+                word = word.encode('ascii')
+            except UnicodeEncodeError:
+                return False
+        slots, offsets, blob = self._slots, self._offsets, self._blob
+        slot = zlib.crc32(word) & self._mask
+        index = slots[slot]
+        while index:
+            if blob[offsets[index - 1]:offsets[index]] == word:
+                return True
+            slot = (slot + 1) & self._mask
+            index = slots[slot]
+        return False
+
+    def ngram_score(self, text):
+        ''' Returns bigram_score() of text with the precompiled bigrams. '''
+        return bigram_score(text, self.bigrams)
+
+
+# Quadgram model, used to score Substitution keys. Characters fall into
+# QUADGRAM_CLASSES classes: A to Z case-folded (0 to 25), whitespace (26),
+# '.' (27), ',' (28), digits (29) and everything else (30). Quadgram log
+# probabilities over those classes live in one flat array indexed
+# ((a * 31 + b) * 31 + c) * 31 + d.
+# Unigram log probabilities are kept per alphabet character, so case and
+# punctuation still count.
+QUADGRAM_CLASSES = 31
+
+
+def quadgram_class(char):
+    ''' Returns the quadgram class of char. '''
+    if 'A' <= char.upper() <= 'Z' and char.isascii():
+        return ord(char.upper()) - 65
+    if char.isspace():
+        return 26
+    if char in '.,':
+        return 27 + '.,'.find(char)
+    if char.isdigit():
+        return 29
+    return 30
+
+
+class QuadgramModel:
+    ''' Quadgram and unigram log probabilities for an alphabet, trained
+        from sample text with .from_text(). Save with .save() and reload
+        with .load() to skip training. '''
+    MAGIC = b'HCQUAD1\x00'
+
+    def __init__(self, alphabet, unigrams, quadgrams):
+        self.alphabet = alphabet
+        self.unigrams = unigrams
+        self.quadgrams = quadgrams
+
+    @classmethod
+    def from_text(cls, text, alphabet=string.printable):
+        ''' Returns a model trained on text, which should be a good deal
+            longer than the ciphertexts it will score. '''
+        classes = text.translate(
+            {ord(char): chr(quadgram_class(char)) for char in set(text)})
+        counts = Counter(classes[index:index + 4]
+                         for index in range(len(classes) - 3))
+        total = max(sum(counts.values()), 1)
+        quadgrams = array('d', [math.log(0.01 / total)]) * QUADGRAM_CLASSES ** 4
+        for quadgram, count in counts.items():
+            a, b, c, d = map(ord, quadgram)
+            quadgrams[((a * QUADGRAM_CLASSES + b) * QUADGRAM_CLASSES + c) *
+                      QUADGRAM_CLASSES + d] = math.log(count / total)
+
+        char_counts = Counter(text)
+        char_total = sum(char_counts[char] for char in alphabet) + len(alphabet)
+        unigrams = array('d', [math.log((char_counts[char] + 1) / char_total)
+                               for char in alphabet])
+        return cls(alphabet, unigrams, quadgrams)
+
+    @classmethod
+    def from_words(cls, words, alphabet=string.printable):
+        ''' Returns a model with quadgrams trained on dictionary words,
+            case-folded and joined by spaces, and unigrams from
+            english_log_probs(), since a word list has no case,
+            punctuation or word frequencies of its own. '''
+        model = cls.from_text(' '.join(sorted(words)).lower(), alphabet)
+        model.unigrams = array('d', english_log_probs(alphabet))
+        return model
+
+    def save(self, file_name):
+        ''' Writes model to file_name. '''
+        encoded = self.alphabet.encode('utf-8')
+        with open(file_name, 'wb') as fo:
+            fo.write(self.MAGIC)
+            fo.write(struct.pack('=I', len(encoded)))
+            fo.write(encoded)
+            self.unigrams.tofile(fo)
+            self.quadgrams.tofile(fo)
+
+    @classmethod
+    def load(cls, file_name):
+        ''' Returns model read from file_name, written by .save(). '''
+        with open(file_name, 'rb') as fo:
+            if fo.read(len(cls.MAGIC)) != cls.MAGIC:
+                raise ValueError('{} is not a quadgram model.'.format(file_name))
+            size, = struct.unpack('=I', fo.read(4))
+            alphabet = fo.read(size).decode('utf-8')
+            unigrams, quadgrams = array('d'), array('d')
+            unigrams.fromfile(fo, len(alphabet))
+            quadgrams.fromfile(fo, QUADGRAM_CLASSES ** 4)
+        return cls(alphabet, unigrams, quadgrams)
+
+
+# Byte tables for the ASCII fast path of is_language(). _ASCII_UPPER
+# uppercases a to z; _ASCII_NOT_KEPT lists the bytes strip_str() would
+# drop; _BIGRAM_INDEX maps A to Z onto 1 to 26 and every other byte onto
+# the word boundary, 0.
+_ASCII_UPPER = bytes.maketrans(string.ascii_lowercase.encode('ascii'),
+                               string.ascii_uppercase.encode('ascii'))
+_ASCII_NOT_KEPT = bytes(byte for byte in range(128)
+                        if not (chr(byte).isalpha() or chr(byte) in ' \t\n'))
+_BIGRAM_INDEX = bytes(byte - 64 if 65 <= byte <= 90 else 0
+                      for byte in range(256))
+
+
 # The following four functions clean an input and check if it is English.
 def is_language(s, dictionary, word_percent=20, letter_percent=85):
     ''' Checks if s is a language by comparing words in s with
         loaded dictionary. Returns true if given percentage of word matches
         and letters in s is high enough. Default values: word_percent
-        is 20 and letter_percent is 85. '''
-    word_match = (words_in_dict(s, dictionary) * 100) >= word_percent
-    sufficient_letters = (len(strip_str(s)) / len(s) * 100) >= letter_percent
-    return word_match and sufficient_letters
+        is 20 and letter_percent is 85. The letter check runs first, so
+        most garbage is rejected before any dictionary lookup. '''
+    if not s:
+        return False
+    if not s.isascii():
+        word_match = (words_in_dict(s, dictionary) * 100) >= word_percent
+        sufficient_letters = (len(strip_str(s)) / len(s) * 100) >= letter_percent
+        return word_match and sufficient_letters
+
+    # ASCII fast path: C-level passes encode, then strip and uppercase in
+    # one translate, then split; set dictionaries of str get one decode.
+    kept = s.encode('ascii').translate(_ASCII_UPPER, _ASCII_NOT_KEPT)
+    if len(kept) / len(s) * 100 < letter_percent:
+        return False
+    if isinstance(dictionary, CompiledDictionary):
+        word_list = kept.split()
+        dictionary = dictionary.words
+    else:
+        word_list = kept.decode('ascii').split()
+    if not word_list:
+        return word_percent <= 0
+    dictionary_words = sum(1 for word in word_list if word in dictionary)
+    return dictionary_words / len(word_list) * 100 >= word_percent
 
 
 def strip_str(string):
@@ -73,6 +416,418 @@ def words_in_dict(string, dictionary):
     return dictionary_words / len(word_list)
 
 
+# Letter-frequency statistics. Keys can be ranked from a single histogram
+# of the ciphertext: the log-likelihood of a key is the sum, over each
+# ciphertext symbol, of its count times the log probability of the symbol
+# it decrypts to. Only the best-ranked keys then need is_language().
+ENGLISH_LETTER_FREQ = {
+    'A': 8.17, 'B': 1.49, 'C': 2.78, 'D': 4.25, 'E': 12.70, 'F': 2.23,
+    'G': 2.02, 'H': 6.09, 'I': 6.97, 'J': 0.15, 'K': 0.77, 'L': 4.03,
+    'M': 2.41, 'N': 6.75, 'O': 7.51, 'P': 1.93, 'Q': 0.10, 'R': 5.99,
+    'S': 6.33, 'T': 9.06, 'U': 2.76, 'V': 0.98, 'W': 2.36, 'X': 0.15,
+    'Y': 1.97, 'Z': 0.07}
+
+# Non-letter characters of English prose, on the same scale as above.
+ENGLISH_SYMBOL_FREQ = {
+    ' ': 19.0, '.': 1.1, ',': 1.0, '\n': 0.4, "'": 0.3, '"': 0.3,
+    '-': 0.2, ';': 0.05, ':': 0.05, '!': 0.05, '?': 0.05}
+
+# Weight of capitals relative to lowercase when an alphabet has both, and
+# the floor given to any character that is neither letter nor listed symbol.
+CAPITAL_WEIGHT = 0.05
+SYMBOL_FLOOR = 0.01
+
+
+@lru_cache(maxsize=16)
+def english_log_probs(alphabet):
+    ''' Returns a tuple of log probabilities, one per character of
+        alphabet, of that character appearing in English text. '''
+    mixed_case = any(char.islower() for char in alphabet)
+    weights = []
+    for char in alphabet:
+        if char.upper() in ENGLISH_LETTER_FREQ:
+            weight = ENGLISH_LETTER_FREQ[char.upper()]
+            if mixed_case and char.isupper():
+                weight *= CAPITAL_WEIGHT
+        else:
+            weight = ENGLISH_SYMBOL_FREQ.get(char, SYMBOL_FLOOR)
+        weights.append(weight)
+    total = sum(weights)
+    return tuple(math.log(weight / total) for weight in weights)
+
+
+def symbol_histogram(text, alphabet):
+    ''' Returns a list of (alphabet index, count) pairs for every alphabet
+        character in text. '''
+    counts = Counter(text)
+    return [(alphabet.find(char), count) for char, count in counts.items()
+            if char in alphabet]
+
+
+def index_of_coincidence(text, alphabet):
+    ''' Returns the chance that two characters drawn from the alphabet
+        characters of text are equal, or 0 for fewer than two. English
+        scores well above a random text's 1 / len(alphabet). '''
+    counts = [count for _, count in symbol_histogram(text, alphabet)]
+    total = sum(counts)
+    if total < 2:
+        return 0
+    return sum(count * (count - 1) for count in counts) / (total * (total - 1))
+
+
+def best_combinations(ranked, top):
+    ''' Returns up to top (loss, choice) pairs, least loss first, choosing
+        one option per position of ranked. ranked holds a list of scores
+        per position, best first; choice is a tuple of option indices and
+        loss is the score given up against the best option everywhere. '''
+    start = (0,) * len(ranked)
+    heap, seen, chosen = [(0, start)], {start}, []
+    while heap and len(chosen) < top:
+        loss, choice = heapq.heappop(heap)
+        chosen.append((loss, choice))
+        for position, option in enumerate(choice):
+            if option + 1 < len(ranked[position]):
+                following = (choice[:position] + (option + 1,) +
+                             choice[position + 1:])
+                if following not in seen:
+                    seen.add(following)
+                    heapq.heappush(heap, (
+                        loss + ranked[position][option] -
+                        ranked[position][option + 1], following))
+    return chosen
+
+
+# Translation engine for monoalphabetic ciphers. Each cipher class that
+# maps one character to one other character provides .translation(key),
+# which returns a source and target alphabet; the resulting str.translate
+# table is built once per (class, key, direction) and cached, so a whole
+# message is encrypted or decrypted with a single .translate() call.
+@lru_cache(maxsize=4096)
+def cipher_table(cipher, key, decrypt=False):
+    ''' Returns cached str.translate table for cipher class and key.
+        Characters outside the cipher's alphabet are left unmapped, so
+        they pass through unchanged. '''
+    source, target = cipher.translation(key, decrypt)
+    return str.maketrans(source, target)
+
+
+# Vegenère engine. Every character of text, in or out of the alphabet,
+# consumes one key character, so the key is tiled over the whole text.
+# Texts of NUMPY_THRESHOLD characters or more go through NumPy when it is
+# installed; shorter texts are not worth the array setup.
+NUMPY_THRESHOLD = 4096
+
+
+def vigenere_shift(text, key, alphabet, sign=1):
+    ''' Shifts each character of text in alphabet by the matching key
+        character; sign=-1 shifts back. Characters outside the alphabet
+        are unchanged. '''
+    if (numpy is not None and len(text) >= NUMPY_THRESHOLD
+            and max(alphabet) <= '\xff'):
+        return _vigenere_shift_numpy(text, key, alphabet, sign)
+    return _vigenere_shift_python(text, key, alphabet, sign)
+
+
+@lru_cache(maxsize=1024)
+def vigenere_byte_table(alphabet, shift):
+    ''' Returns a bytes.translate table shifting the Latin-1 code points of
+        alphabet by shift and leaving every other byte as is. '''
+    table = bytearray(range(256))
+    for index, char in reversed(list(enumerate(alphabet))):
+        table[ord(char)] = ord(alphabet[(index + shift) % len(alphabet)])
+    return bytes(table)
+
+
+@lru_cache(maxsize=1024)
+def vigenere_table(alphabet, shift):
+    ''' Returns a str.translate table shifting the characters of alphabet
+        by shift. '''
+    return {ord(char): alphabet[(index + shift) % len(alphabet)]
+            for index, char in reversed(list(enumerate(alphabet)))}
+
+
+def vigenere_shift_bytes(data, key, alphabet, sign=1):
+    ''' Bytes counterpart of vigenere_shift(): each byte takes the byte
+        table of its key character, one strided slice per key position. '''
+    data = _as_bytes(data)
+    width = len(key)
+    shifted = bytearray(len(data))
+    for col, key_char in enumerate(key[:len(data)]):
+        table = vigenere_byte_table(alphabet, sign * alphabet.find(key_char))
+        shifted[col::width] = data[col::width].translate(table)
+    return bytes(shifted)
+
+
+def _vigenere_shift_python(text, key, alphabet, sign):
+    ''' Pure Python Vegenère shift. '''
+    indices = {char: index for index, char in enumerate(alphabet)}
+    length = len(alphabet)
+    shifts = [sign * alphabet.find(key_char) for key_char in key]
+    shifted = []
+    for char, shift in zip(text, cycle(shifts)):
+        index = indices.get(char)
+        if index is None:
+            shifted.append(char)
+        else:
+            shifted.append(alphabet[(index + shift) % length])
+    return ''.join(shifted)
+
+
+@lru_cache(maxsize=16)
+def _numpy_alphabet(alphabet):
+    ''' Returns (lookup, codes) arrays for alphabet. lookup maps a Latin-1
+        code point to its alphabet index, or -1; codes is the inverse. '''
+    lookup = numpy.full(256, -1, dtype=numpy.int16)
+    codes = numpy.array([ord(char) for char in alphabet], dtype=numpy.uint8)
+    for index, char in reversed(list(enumerate(alphabet))):
+        lookup[ord(char)] = index
+    return lookup, codes
+
+
+# Keys longer than this are applied by index arithmetic instead of one
+# byte table per key character.
+NUMPY_MAX_TABLE_KEY = 1024
+
+
+def _vigenere_shift_numpy(text, key, alphabet, sign):
+    ''' Vectorized Vegenère shift. Latin-1 text is viewed as a matrix with
+        one column per key character, and each column is mapped through
+        that character's byte table. Wider text is shifted on UTF-32 code
+        points. '''
+    shifts = [sign * alphabet.find(key_char) for key_char in key]
+    try:
+        data = text.encode('latin-1')
+    except UnicodeEncodeError:
+        data = None
+    if data is not None and len(shifts) <= NUMPY_MAX_TABLE_KEY:
+        width = len(shifts)
+        padding = -len(data) % width
+        grid = numpy.frombuffer(data + bytes(padding), dtype=numpy.uint8)
+        grid = grid.reshape(-1, width)
+        result = numpy.empty_like(grid)
+        for col, shift in enumerate(shifts):
+            table = numpy.frombuffer(vigenere_byte_table(alphabet, shift),
+                                     dtype=numpy.uint8)
+            numpy.take(table, grid[:, col], out=result[:, col])
+        return result.tobytes()[:len(data)].decode('latin-1')
+
+    text_codes = numpy.frombuffer(text.encode('utf-32-le'), dtype=numpy.uint32)
+    lookup, codes = _numpy_alphabet(alphabet)
+    indices = lookup[numpy.minimum(text_codes, 255)]
+    # Code points above Latin-1 are never in the alphabet.
+    indices[text_codes > 255] = -1
+    shifted = (indices + numpy.resize(shifts, len(text_codes))) % len(alphabet)
+    result = numpy.where(indices >= 0, codes[shifted], text_codes)
+    return result.astype(numpy.uint32).tobytes().decode('utf-32-le')
+
+
+# Bytes mode. ASCII payloads in bytes, bytearray, memoryview or mmap
+# buffers are transformed with bytes.translate tables, with no decode or
+# encode step; bytes outside ASCII pass through unchanged. Monoalphabetic
+# ciphers get one cached 256-byte table per key, built by running the
+# cipher over the 128 ASCII characters once.
+BYTES_CHUNK_SIZE = 1 << 16
+_ASCII = ''.join(chr(byte) for byte in range(128))
+
+
+@lru_cache(maxsize=4096)
+def cipher_byte_table(cipher, key, decrypt=False):
+    ''' Returns cached bytes.translate table for a monoalphabetic cipher
+        class and key. '''
+    if decrypt:
+        mapped = cipher().decrypt(_ASCII, passed_key=key)
+    else:
+        mapped = cipher().encrypt(_ASCII, passed_key=key)
+    return mapped.encode('latin-1') + bytes(range(128, 256))
+
+
+def _as_bytes(data):
+    ''' Returns data if it is bytes or bytearray, else a bytes copy. '''
+    if isinstance(data, (bytes, bytearray)):
+        return data
+    return bytes(data)
+
+
+# Helpers for the streaming methods of Cipher.
+STREAM_CHUNK_SIZE = 1 << 20
+
+
+def _read_chunks(reader, chunk_size):
+    ''' Yields chunks from reader.read(chunk_size) until it is exhausted. '''
+    chunk = reader.read(chunk_size)
+    while chunk:
+        yield chunk
+        chunk = reader.read(chunk_size)
+
+
+def _write_chunks(writer, chunks):
+    ''' Writes each chunk to writer; returns total length written. '''
+    written = 0
+    for chunk in chunks:
+        writer.write(chunk)
+        written += len(chunk)
+    return written
+
+
+# Transposition engine. Encryption reads column col of the grid as the
+# slice message[col::key], so the ciphertext is the key columns laid end
+# to end. Decryption only needs where each column starts and stops in the
+# ciphertext, which follows from the column lengths: the first length %
+# key columns hold one more character than the rest. The full permutation,
+# used to apply one key to many same-length texts, and the bounds behind
+# it are cached per (length, key); a hack tries too many keys, each with
+# up to length / 2 columns, to cache the bounds for every one.
+@lru_cache(maxsize=16)
+def transposition_columns(length, key):
+    ''' Returns (start, stop) bounds of each column in a transposition
+        ciphertext of length characters under key. '''
+    columns, start = [], 0
+    for col in range(min(key, length)):
+        stop = start + len(range(col, length, key))
+        columns.append((start, stop))
+        start = stop
+    return tuple(columns)
+
+
+@lru_cache(maxsize=16)
+def transposition_order(length, key, decrypt=False):
+    ''' Returns an itemgetter that permutes a text of length characters,
+        length at least 2, into its transposition under key. '''
+    if decrypt:
+        positions = [0] * length
+        for col, (start, stop) in enumerate(transposition_columns(length, key)):
+            positions[col::key] = range(start, stop)
+    else:
+        positions = [index for col in range(min(key, length))
+                     for index in range(col, length, key)]
+    return itemgetter(*positions)
+
+
+# Transposition cracking. A key is scored without decrypting: sampled
+# plaintext positions are mapped straight to their ciphertext indices, and
+# the letter bigrams each forms with the next position, which mostly
+# straddle column joins, are scored against dictionary bigrams. Every key
+# gets a quick score from TRANSPOSITION_QUICK_SAMPLES positions, and the
+# best TRANSPOSITION_KEEP are rescored from TRANSPOSITION_SAMPLES.
+# Keys near a large true key decrypt to the right text but for a few
+# seams, so samples cannot tell them apart; the best TRANSPOSITION_REFINE
+# are refined on every position, and .hack() checks the dictionary on
+# TRANSPOSITION_WINDOW keys either side of its best match.
+TRANSPOSITION_QUICK_SAMPLES = 64
+TRANSPOSITION_SAMPLES = 512
+TRANSPOSITION_KEEP = 256
+TRANSPOSITION_REFINE = 4
+TRANSPOSITION_WINDOW = 8
+# Keys scored per NumPy block, to bound memory.
+TRANSPOSITION_BLOCK = 8192
+
+
+def transposition_scores(codes, keys, samples, bigrams):
+    ''' Returns a list of the mean bigram log probability, per key in keys,
+        at samples positions spread evenly over the plaintext. codes is
+        the ciphertext translated by _BIGRAM_INDEX; bigrams is from
+        bigram_log_probs(). '''
+    length = len(codes)
+    step = max((length - 1) // samples, 1)
+    positions = range(0, length - 1, step)[:samples]
+    if not positions:
+        return [0.0] * len(keys)
+    if numpy is not None and len(keys) * len(positions) >= NUMPY_THRESHOLD:
+        return _transposition_scores_numpy(codes, keys, positions, bigrams)
+
+    scores = []
+    for key in keys:
+        rows, extra = divmod(length, key)
+        total = 0.0
+        for position in positions:
+            col, row = position % key, position // key
+            first = codes[col * rows + min(col, extra) + row]
+            col, row = (position + 1) % key, (position + 1) // key
+            second = codes[col * rows + min(col, extra) + row]
+            total += bigrams[first * 27 + second]
+        scores.append(total / len(positions))
+    return scores
+
+
+def transposition_refine(codes, key, keys, bigrams, scores=None):
+    ''' Returns (key, score) for the best key near key in keys, scoring
+        every position. The full score falls away on both sides of the
+        true key, roughly in step with the number of seams, but is rough
+        from one key to the next; steps start at a sixteenth of key and
+        halve whenever neither side improves. scores, a dict, keeps full
+        scores between calls. '''
+    if scores is None:
+        scores = {}
+
+    def score(key):
+        if key not in scores:
+            scores[key] = transposition_scores(codes, [key], len(codes),
+                                               bigrams)[0]
+        return scores[key]
+
+    best, step = score(key), 1
+    while step * 2 <= key // 16:
+        step *= 2
+    while step:
+        for candidate in (key - step, key + step):
+            if candidate in keys and score(candidate) > best:
+                key, best = candidate, score(candidate)
+                break
+        else:
+            step //= 2
+    return key, best
+
+
+def _transposition_scores_numpy(codes, keys, positions, bigrams):
+    ''' NumPy transposition_scores(), a block of keys at a time. '''
+    codes = numpy.frombuffer(codes, dtype=numpy.uint8).astype(numpy.intp)
+    bigrams = numpy.asarray(bigrams, dtype=numpy.float64)
+    positions = numpy.asarray(positions, dtype=numpy.intp)
+    length = len(codes)
+    scores = []
+    for start in range(0, len(keys), TRANSPOSITION_BLOCK):
+        block = numpy.asarray(keys[start:start + TRANSPOSITION_BLOCK],
+                              dtype=numpy.intp)[:, None]
+        rows, extra = length // block, length % block
+
+        def indices(position):
+            col, row = position % block, position // block
+            return col * rows + numpy.minimum(col, extra) + row
+        pairs = codes[indices(positions)] * 27 + codes[indices(positions + 1)]
+        scores.extend(bigrams[pairs].mean(axis=1).tolist())
+    return scores
+
+
+# Known-plaintext (crib) attacks. A crib is plaintext known to appear in
+# the message. Each cipher's .solve_crib() reads its key straight from the
+# aligned characters; when the crib's offset is unknown, it slides the crib
+# along the ciphertext, and each offset is dropped at the first character
+# that disagrees with the key read so far.
+def crib_offsets(ciphertext, crib, offset=None):
+    ''' Returns the offsets at which crib can start in ciphertext: just
+        offset if given and crib fits there, else every offset. '''
+    if offset is not None:
+        fits = 0 <= offset and offset + len(crib) <= len(ciphertext)
+        return [offset] if fits and crib else []
+    return range(len(ciphertext) - len(crib) + 1) if crib else []
+
+
+def crib_pairs(ciphertext, crib, start, alphabet):
+    ''' Returns a dict mapping the alphabet index of each crib character to
+        that of the ciphertext character under it, starting at start; None
+        if the crib cannot line up there. Characters outside alphabet must
+        match exactly, and one plain character cannot map to two. '''
+    pairs = {}
+    for plain, cipher in zip(crib, ciphertext[start:start + len(crib)]):
+        plain_index, cipher_index = alphabet.find(plain), alphabet.find(cipher)
+        if plain_index < 0 or cipher_index < 0:
+            if plain != cipher:
+                return None
+        elif pairs.setdefault(plain_index, cipher_index) != cipher_index:
+            return None
+    return pairs
+
+
 # Cipher classes follow. The base Cipher class initializes a message,
 # ciphertext, and key. If the key is known, it automatically produces
 # a ciphertext or plaintext from .encrypt()/.decrypt() class methods.
@@ -100,6 +855,216 @@ class Cipher:
         ''' This is a placeholder method. It returns None. '''
         return None
 
+    @classmethod
+    def key_space(cls, ciphertext):
+        ''' This is a placeholder method. It returns an empty range. '''
+        return range(0)
+
+    def rank_keys(self, ciphertext=None):
+        ''' Returns (key, score) pairs, best first. This placeholder keeps
+            .key_space() order with a score of 0 for every key. '''
+        return [(key, 0) for key in self.key_space(ciphertext or
+                                                   self.ciphertext)]
+
+    @classmethod
+    def gen_keys(cls, count, rng=None):
+        ''' Returns list of count keys from .gen_key(). '''
+        rng = rng or random
+        return [cls.gen_key(rng) for _ in range(count)]
+
+    def hack(self, dictionary=None, top=None, workers=None, stats=None,
+             cache=None, early_exit=False):
+        ''' Returns a HackResult for each key in .key_space(), or in the
+            top of .rank_keys(), whose decryption passes is_language(),
+            best first. Other arguments are as for search_keys(). '''
+        if not self.ciphertext:
+            raise AttributeError('There is no ciphertext. ')
+        dictionary = dictionary or english_dictionary()
+
+        def search():
+            if top is None:
+                keys = self.key_space(self.ciphertext)
+            else:
+                keys = [key for key, _ in self.rank_keys()[:top]]
+            return HackResult.rank(search_keys(
+                type(self), self.ciphertext, dictionary, keys,
+                workers=workers, stats=stats, early_exit=early_exit),
+                dictionary)
+        return cached_hack(cache, type(self), self.ciphertext, dictionary,
+                           {'top': top, 'early_exit': early_exit}, search)
+
+    def decrypt_prefix(self, ciphertext, length, passed_key=None):
+        ''' Returns the first length characters of the decryption of
+            ciphertext, without decrypting the rest. '''
+        return self.decrypt(ciphertext[:length], passed_key=passed_key)
+
+    # Batches. .encrypt_many()/.decrypt_many() run many records through
+    # one function per key, built once by .transformer(), without creating
+    # an object per record. keys is either one key for the whole batch or
+    # a list or tuple with one key per record.
+    @classmethod
+    def transformer(cls, key, decrypt=False):
+        ''' Returns a function of one text that encrypts it, or decrypts it
+            if decrypt is set, with key. Ciphers with a .translation()
+            look up their cached table here, once. '''
+        if not key:
+            raise AttributeError('Cannot encrypt or decrypt without key.')
+        if hasattr(cls, 'translation'):
+            table = cipher_table(cls, key, decrypt)
+            return lambda text: text.translate(table)
+        instance = cls()
+        method = instance.decrypt if decrypt else instance.encrypt
+        return lambda text: method(text, passed_key=key)
+
+    @classmethod
+    def with_key(cls, key):
+        ''' Returns a KeyedCipher for key; see KeyedCipher. '''
+        return KeyedCipher(cls, key)
+
+    @classmethod
+    def encrypt_many(cls, messages, keys):
+        ''' Returns list of ciphertexts, one per message. '''
+        return cls._transform_many(messages, keys, decrypt=False)
+
+    @classmethod
+    def decrypt_many(cls, ciphertexts, keys):
+        ''' Returns list of plaintexts, one per ciphertext. '''
+        return cls._transform_many(ciphertexts, keys, decrypt=True)
+
+    @classmethod
+    def _transform_many(cls, texts, keys, decrypt):
+        ''' Applies .transformer() to texts, sharing it between records
+            with the same key. '''
+        if not isinstance(keys, (list, tuple)):
+            return list(map(cls.transformer(keys, decrypt), texts))
+        texts = list(texts)
+        if len(texts) != len(keys):
+            raise ValueError('Got {} keys for {} texts.'.format(
+                len(keys), len(texts)))
+        transformers = {}
+        results = []
+        for text, key in zip(texts, keys):
+            transform = transformers.get(key)
+            if transform is None:
+                transform = transformers[key] = cls.transformer(key, decrypt)
+            results.append(transform(text))
+        return results
+
+    # Streaming. Text is encrypted or decrypted one chunk at a time, so
+    # memory use is bounded by the chunk size rather than the input size.
+    # .stream_key() carries key state, such as a Vegenère key position,
+    # across chunk boundaries.
+    def stream_key(self, key, offset):
+        ''' Returns the key for a chunk starting offset characters into a
+            stream. Ciphers without key state use key throughout. '''
+        return key
+
+    def iter_encrypt(self, chunks, passed_key=None):
+        ''' Yields ciphertext for each plaintext chunk in chunks. '''
+        return self._iter_transform(chunks, passed_key, self.encrypt)
+
+    def iter_decrypt(self, chunks, passed_key=None):
+        ''' Yields plaintext for each ciphertext chunk in chunks. '''
+        return self._iter_transform(chunks, passed_key, self.decrypt)
+
+    def encrypt_stream(self, reader, writer, chunk_size=STREAM_CHUNK_SIZE,
+                       passed_key=None):
+        ''' Encrypts text read from reader into writer, chunk_size
+            characters at a time. Returns number of characters written. '''
+        return _write_chunks(writer, self.iter_encrypt(
+            _read_chunks(reader, chunk_size), passed_key))
+
+    def decrypt_stream(self, reader, writer, chunk_size=STREAM_CHUNK_SIZE,
+                       passed_key=None):
+        ''' Decrypts text read from reader into writer, chunk_size
+            characters at a time. Returns number of characters written. '''
+        return _write_chunks(writer, self.iter_decrypt(
+            _read_chunks(reader, chunk_size), passed_key))
+
+    # Bytes mode; see cipher_byte_table(). .encrypt_into()/.decrypt_into()
+    # rewrite a writable buffer in place, BYTES_CHUNK_SIZE bytes at a
+    # time, so the only extra memory is one chunk.
+    def byte_transform(self, data, key, decrypt=False):
+        ''' Returns data encrypted, or decrypted if decrypt is set, with key.
+            Ciphers with a .translation() use a cached byte table; others
+            raise NotImplementedError. '''
+        if not hasattr(self, 'translation'):
+            raise NotImplementedError(
+                '{} has no bytes mode.'.format(type(self).__name__))
+        table = cipher_byte_table(type(self), key, decrypt)
+        return _as_bytes(data).translate(table)
+
+    def encrypt_bytes(self, data, passed_key=None):
+        ''' Returns encrypted copy of bytes-like data. '''
+        return self.byte_transform(data, self._require_key(passed_key))
+
+    def decrypt_bytes(self, data, passed_key=None):
+        ''' Returns decrypted copy of bytes-like data. '''
+        return self.byte_transform(data, self._require_key(passed_key),
+                                   decrypt=True)
+
+    def encrypt_into(self, buffer, passed_key=None):
+        ''' Encrypts writable buffer in place. '''
+        self._transform_into(buffer, passed_key, decrypt=False)
+
+    def decrypt_into(self, buffer, passed_key=None):
+        ''' Decrypts writable buffer in place. '''
+        self._transform_into(buffer, passed_key, decrypt=True)
+
+    def _transform_into(self, buffer, passed_key, decrypt):
+        ''' Rewrites buffer chunk by chunk with .byte_transform(). '''
+        key = self._require_key(passed_key)
+        view = memoryview(buffer).cast('B')
+        for start in range(0, len(view), BYTES_CHUNK_SIZE):
+            chunk = view[start:start + BYTES_CHUNK_SIZE]
+            chunk[:] = self.byte_transform(
+                chunk, self.stream_key(key, start), decrypt)
+            chunk.release()
+        view.release()
+
+    def _require_key(self, passed_key):
+        ''' Returns passed_key or key attribute; raises AttributeError if
+            there is neither. '''
+        key = passed_key or self.key
+        if not key:
+            raise AttributeError('Cannot encrypt or decrypt without key.')
+        return key
+
+    def _iter_transform(self, chunks, passed_key, transform):
+        ''' Applies transform to each non-empty chunk with its stream key. '''
+        key = self._require_key(passed_key)
+        offset = 0
+        for chunk in chunks:
+            if chunk:
+                yield transform(chunk, passed_key=self.stream_key(key, offset))
+                offset += len(chunk)
+
+
+class KeyedCipher:
+    ''' Immutable cipher class and key pair, made by Cipher.with_key().
+        Both transforms are built on creation and nothing else is stored,
+        so one instance can be reused, from any number of threads, with
+        no per-call setup. Calling it encrypts. '''
+    __slots__ = ('cipher', 'key', 'encrypt', 'decrypt')
+
+    def __init__(self, cipher, key):
+        for name, value in (('cipher', cipher), ('key', key),
+                            ('encrypt', cipher.transformer(key)),
+                            ('decrypt', cipher.transformer(key, True))):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('KeyedCipher is immutable.')
+
+    def __delattr__(self, name):
+        raise AttributeError('KeyedCipher is immutable.')
+
+    def __call__(self, text):
+        return self.encrypt(text)
+
+    def __repr__(self):
+        return '{}.with_key({!r})'.format(self.cipher.__name__, self.key)
+
 
 class Caesar(Cipher):
     ''' Carries encryption and decryption methods for Caesar ciphers.
@@ -109,6 +1074,43 @@ class Caesar(Cipher):
         be useful. '''
     LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
 
+    @classmethod
+    def translation(cls, key, decrypt=False):
+        ''' Returns (source, target) alphabets for key; shifted alphabet
+            is the source when decrypting. '''
+        shift = key % len(cls.LETTERS)
+        shifted = cls.LETTERS[shift:] + cls.LETTERS[:shift]
+        if decrypt:
+            return shifted, cls.LETTERS
+        return cls.LETTERS, shifted
+
+    @classmethod
+    def solve_crib(cls, ciphertext, crib, offset=None):
+        ''' Returns (offset, key) for each offset where crib, known
+            plaintext, lines up with ciphertext under a single shift; see
+            crib_offsets(). A shift of 0 is reported as key 26. '''
+        ciphertext, crib = ciphertext.upper(), crib.upper()
+        length = len(cls.LETTERS)
+        solutions = []
+        for start in crib_offsets(ciphertext, crib, offset):
+            pairs = crib_pairs(ciphertext, crib, start, cls.LETTERS)
+            if not pairs:
+                continue
+            shifts = {(cipher - plain) % length
+                      for plain, cipher in pairs.items()}
+            if len(shifts) == 1:
+                solutions.append((start, shifts.pop() or length))
+        return solutions
+
+    @classmethod
+    def transformer(cls, key, decrypt=False):
+        ''' Returns a function of one text that encrypts or decrypts it;
+            see Cipher.transformer(). Text is uppercased first. '''
+        if not key:
+            raise AttributeError('Cannot encrypt or decrypt without key.')
+        table = cipher_table(cls, key, decrypt)
+        return lambda text: text.upper().translate(table)
+
     def decrypt(self, ciphertext=None, passed_key=None):
         ''' Decrypts ciphertext.
         Defaults to key and ciphertext attributes if neither is passed.'''
@@ -118,18 +1120,8 @@ class Caesar(Cipher):
         if key is None:
             print('Cannot decrypt without key. Set key or use .hack().')
             return None
-
-        message = []
-        for char in ciphertext.upper():
-            if char in self.LETTERS:
-                index = self.LETTERS.find(char)
-                index -= key
-                if index >= len(self.LETTERS) or index < 0:
-                    index = abs(index % len(self.LETTERS))
-                message.append(self.LETTERS[index])
-            else:
-                message.append(char)
-        return ''.join(message)
+        return ciphertext.upper().translate(
+            cipher_table(type(self), key, decrypt=True))
 
     def encrypt(self, plaintext=None, passed_key=None):
         ''' Encrypts ciphertext.
@@ -140,35 +1132,25 @@ class Caesar(Cipher):
         if key is None:
             print('You must set key to encrypt. ')
             return None
+        return message.upper().translate(cipher_table(type(self), key))
 
-        ciphertext = []
-        for char in message.upper():
-            if char in self.LETTERS:
-                index = self.LETTERS.find(char)
-                index += key
-                if index >= len(self.LETTERS):
-                    index = index % len(self.LETTERS)
-                ciphertext.append(self.LETTERS[index])
-            else:
-                ciphertext.append(char)
-        return ''.join(ciphertext)
+    @classmethod
+    def key_space(cls, ciphertext):
+        ''' Returns the keys .hack() tries, in order. '''
+        return range(1, len(cls.LETTERS))
 
-    def hack(self):
-        ''' Prints results of all possible keys. '''
-        if not self.ciphertext:
-            raise AttributeError('There is no ciphertext. ')
-        matches = []
-        print('Attempting hack of Caesar cipher...')
-        for key in range(1, len(self.LETTERS)):
-            attempt = self.decrypt(key)
-            if is_language(attempt, english_dict):
-                matches.append(attempt)
-                print('Possible match with key {}:\n{}'.format(
-                    key, self.decrypt(key)))
-        if matches:
-            return matches
-        else:
-            print('Unable to find key.')
+    def rank_keys(self, ciphertext=None):
+        ''' Returns (key, score) pairs for every key, best first, scored by
+            the log-likelihood of the decrypted letter frequencies. Does not
+            decrypt. '''
+        ciphertext = ciphertext or self.ciphertext
+        length = len(self.LETTERS)
+        log_probs = english_log_probs(self.LETTERS)
+        histogram = symbol_histogram(ciphertext.upper(), self.LETTERS)
+        scores = [(key, sum(count * log_probs[(index - key) % length]
+                            for index, count in histogram))
+                  for key in range(1, length)]
+        return sorted(scores, key=lambda pair: pair[1], reverse=True)
 
 
 class Transposition(Cipher):
@@ -179,13 +1161,7 @@ class Transposition(Cipher):
         key = passed_key or self.key
         message = plaintext or self.message
         while key < (len(message) / 2):
-            ciphergrid = [''] * key
-            for col in range(0, key):
-                index = col
-                while index < len(message):
-                    ciphergrid[col] += message[index]
-                    index += key
-            return ''.join(ciphergrid)
+            return ''.join(message[col::key] for col in range(key))
         else:
             print('Set a key value less than half message length.')
 
@@ -195,37 +1171,131 @@ class Transposition(Cipher):
         key = passed_key or self.key
         ciphertext = ciphertext or self.ciphertext
         while key:
-            decrypt_cols = math.ceil(len(ciphertext) / key)
-            decrypt_rows = key
-            decrypt_grid = [''] * decrypt_cols
-            empty_boxes = decrypt_cols * decrypt_rows - len(ciphertext)
-            row = 0
-            col = 0
-            for char in ciphertext:
-                decrypt_grid[col] += char
-                col += 1
-                if col == decrypt_cols or (col == decrypt_cols - 1 and row >= decrypt_rows - empty_boxes):
-                    row += 1
-                    col = 0
-            return ''.join(decrypt_grid)
-
+            plaintext = [''] * len(ciphertext)
+            rows, extra = divmod(len(ciphertext), key)
+            start = 0
+            for col in range(min(key, len(ciphertext))):
+                stop = start + rows + (col < extra)
+                plaintext[col::key] = ciphertext[start:stop]
+                start = stop
+            return ''.join(plaintext)
         else:
             print('Cannot decrypt without key. Set key or use .hack().')
 
-    def hack(self):
-        ''' Runs through all possible encrypt(key) possibilities; prints
-        results. '''
+    def decrypt_prefix(self, ciphertext, length, passed_key=None):
+        ''' Returns the first length characters of the decryption of
+            ciphertext, reading each straight from its column. '''
+        key = passed_key or self.key
+        rows, extra = divmod(len(ciphertext), key)
+        return ''.join(ciphertext[col * rows + min(col, extra) + index // key]
+                       for index, col in (
+                           (index, index % key)
+                           for index in range(min(length, len(ciphertext)))))
+
+    @classmethod
+    def key_space(cls, ciphertext):
+        ''' Returns the keys .hack() tries, in order: those .encrypt()
+            accepts, below half the ciphertext length. '''
+        return range(1, (len(ciphertext) + 1) // 2)
+
+    def rank_keys(self, ciphertext=None, dictionary=None):
+        ''' Returns (key, score) pairs for every key in .key_space(), best
+            first, scored by the dictionary bigrams at sampled column joins
+            (see transposition_scores()). Does not decrypt. '''
+        ciphertext = ciphertext or self.ciphertext
+        bigrams = dictionary_bigrams(dictionary or english_dictionary())
+        codes = ciphertext.encode('ascii', 'replace').upper().translate(
+            _BIGRAM_INDEX)
+        keys = self.key_space(ciphertext)
+        quick = sorted(zip(keys, transposition_scores(
+            codes, keys, TRANSPOSITION_QUICK_SAMPLES, bigrams)),
+            key=itemgetter(1), reverse=True)
+        best = [key for key, _ in quick[:TRANSPOSITION_KEEP]]
+        rescored = sorted(zip(best, transposition_scores(
+            codes, best, TRANSPOSITION_SAMPLES, bigrams)),
+            key=itemgetter(1), reverse=True)
+        full_scores = {}
+        refined = dict(transposition_refine(codes, key, keys, bigrams,
+                                            full_scores)
+                       for key, _ in rescored[:TRANSPOSITION_REFINE])
+        refined = sorted(refined.items(), key=itemgetter(1), reverse=True)
+        return refined + [pair for pair in rescored + quick[TRANSPOSITION_KEEP:]
+                          if pair[0] not in dict(refined)]
+
+    def stream_key(self, key, offset):
+        ''' Transposition needs the whole message at once, so it cannot
+            be streamed. Raises NotImplementedError. '''
+        raise NotImplementedError('Transposition cannot be streamed.')
+
+    @classmethod
+    def permute_batch(cls, texts, key, decrypt=False):
+        ''' Encrypts, or decrypts if decrypt is set, every text in texts
+            with key. Texts of equal length share one cached permutation.
+            Unlike .encrypt(), does not refuse keys of half the length or
+            more. Returns a list. '''
+        results = []
+        for text in texts:
+            if len(text) < 2:
+                results.append(text)
+            else:
+                order = transposition_order(len(text), key, decrypt)
+                results.append(''.join(order(text)))
+        return results
+
+    @classmethod
+    def transformer(cls, key, decrypt=False):
+        ''' Returns a function of one text that encrypts or decrypts it
+            with .permute_batch(); see Cipher.transformer(). '''
+        if not key:
+            raise AttributeError('Cannot encrypt or decrypt without key.')
+        return lambda text: cls.permute_batch([text], key, decrypt)[0]
+
+    def hack(self, dictionary=None, top=10, workers=None, stats=None,
+             cache=None, early_exit=False):
+        ''' As Cipher.hack(), with top=10, plus the TRANSPOSITION_WINDOW
+            keys either side of the best match; words_in_dict() ties go to
+            the better bigram_score(). '''
         if not self.ciphertext:
             raise AttributeError('There is no ciphertext. ')
-        else:
-            for key in range(1, len(self.message)):
-                attempt = self.decrypt(key)
-                if is_language(attempt, english_dict):
-                    possible_match = True
-                    print('Possible match with key {}:\n{}'.format(key,
-                          self.decrypt(key)))
-            if not possible_match:
-                print('Unable to find possible match.')
+        dictionary = dictionary or english_dictionary()
+
+        bigrams = dictionary_bigrams(dictionary)
+
+        def rank(matches):
+            return sorted(((words_in_dict(attempt, dictionary),
+                            bigram_score(attempt, bigrams), key, attempt)
+                           for key, attempt in matches),
+                          key=itemgetter(0, 1), reverse=True)
+
+        def search():
+            if top is None:
+                ranked = rank(search_keys(type(self), self.ciphertext,
+                                          dictionary, workers=workers,
+                                          stats=stats, early_exit=early_exit))
+            else:
+                keys = [key for key, _ in
+                        self.rank_keys(dictionary=dictionary)[:top]]
+                ranked = rank(search_keys(type(self), self.ciphertext,
+                                          dictionary, keys, workers=workers,
+                                          stats=stats, early_exit=early_exit))
+                # Walk the window to the best match until it stays put.
+                key_space, tried = self.key_space(self.ciphertext), set(keys)
+                centre = None
+                while ranked and ranked[0][2] != centre:
+                    centre = ranked[0][2]
+                    nearby = [near for near in range(
+                                  centre - TRANSPOSITION_WINDOW,
+                                  centre + TRANSPOSITION_WINDOW + 1)
+                              if near in key_space and near not in tried]
+                    tried.update(nearby)
+                    ranked = sorted(ranked + rank(search_keys(
+                        type(self), self.ciphertext, dictionary, nearby,
+                        workers=workers, stats=stats, early_exit=early_exit)),
+                        key=itemgetter(0, 1), reverse=True)
+            return [HackResult(key, score, attempt[:PREVIEW_LENGTH])
+                    for score, _, key, attempt in ranked]
+        return cached_hack(cache, type(self), self.ciphertext, dictionary,
+                           {'top': top, 'early_exit': early_exit}, search)
 
 
 class Affine(Cipher):
@@ -233,45 +1303,50 @@ class Affine(Cipher):
         a key generator and checker. '''
     CHARS = string.printable
 
-    def get_key(self):
-        ''' Checks if a key is present. If not, calls gen_key() and sets
-            self.key equal to result. If so, asks for confirmation first.'''
-        if self.key:
-            print('Key already present: {}. Overwrite? Y/n'.format(self.key))
-            key_confirmation = input('> ')
-            if key_confirmation.strip().upper().startswith('Y'):
-                self.key = self.gen_key()
-        else:
-            self.key = self.gen_key()
+    def get_key(self, rng=None, overwrite=False):
+        ''' Sets key attribute to a generated key if there is none, or if
+            overwrite is set, and returns it. '''
+        if overwrite or not self.key:
+            self.key = self.gen_key(rng)
+        return self.key
 
-    def gen_key(self):
-        ''' Generates key for the affine cipher.'''
-        while True:
-            mult_key = random.randint(2, len(self.CHARS))
-            add_key = random.randint(1, len(self.CHARS) - 1)
-            if gcd(mult_key, len(self.CHARS)) == 1:
-                return mult_key * len(self.CHARS) + add_key
+    @classmethod
+    def gen_key(cls, rng=None):
+        ''' Generates key for the affine cipher. The multiplication key is
+            drawn from the units mod len(CHARS), so every draw is valid.
+            rng is a random.Random (default: the random module); pass a
+            random.SystemRandom for keys from the OS entropy source. '''
+        rng = rng or random
+        length = len(cls.CHARS)
+        return (rng.choice(affine_multipliers(length)) * length +
+                rng.randrange(1, length))
 
     def split_key(self, key):
         ''' Splits single key into one multiplication and one additive int.'''
         return divmod(key, len(self.CHARS))
 
+    @classmethod
+    def translation(cls, key, decrypt=False):
+        ''' Returns (source, target) alphabets for key. Decryption maps
+            through the modular inverse of the multiplication key. '''
+        length = len(cls.CHARS)
+        mult_key, add_key = divmod(key, length)
+        if decrypt:
+            inverse_key = mod_inverse(mult_key, length)
+            target = [cls.CHARS[(index - add_key) * inverse_key % length]
+                      for index in range(length)]
+        else:
+            target = [cls.CHARS[(index * mult_key + add_key) % length]
+                      for index in range(length)]
+        return cls.CHARS, ''.join(target)
+
     def encrypt(self, plaintext=None, passed_key=None):
         ''' Encrypts message attribute for Affine cipher; defaults
             to self.key, self.message if None passed. '''
         message = plaintext or self.message
         key = passed_key or self.key
-        ciphertext = []
         while key:
-            key = self.split_key(key)
-            for char in message:
-                if char in self.CHARS:
-                    index = self.CHARS.find(char)
-                    ciphertext.append(self.CHARS[(index * key[0] + key[1]) %
-                                                 len(self.CHARS)])
-                else:
-                    ciphertext.append(char)
-            return ''.join(ciphertext)
+            return message.translate(cipher_table(type(self), key))
         else:
             print('Cannot encrypt without key.')
 
@@ -280,70 +1355,116 @@ class Affine(Cipher):
             self.ciphertext if None passed. '''
         ciphertext = ciphertext or self.ciphertext
         key = passed_key or self.key
-        plaintext = []
         while key:
-            key = self.split_key(key)
-            inverse_key = mod_inverse(key[0], len(self.CHARS))
-            for char in ciphertext:
-                if char in self.CHARS:
-                    index = self.CHARS.find(char)
-                    plaintext.append(self.CHARS[(index - key[1]) * 
-                                                inverse_key % len(self.CHARS)])
-                else:
-                    plaintext.append(char)
-            return ''.join(plaintext)
+            return ciphertext.translate(
+                cipher_table(type(self), key, decrypt=True))
         else:
             print('Cannot decrypt without key. Set key or use .hack().')
 
-    def hack(self):
-        ''' Runs through all possible encrypt(key) possibilities. Prints
-            results.'''
-        print('Attempting to hack Affine cipher. ')
-
-        while self.ciphertext:
-            possible_match = False
-            for key in range(len(self.CHARS) ** 2):
-                key_check = self.split_key(key)
-                if gcd(key_check[0], len(self.CHARS)) != 1:
-                    continue
-                attempt = self.decrypt(passed_key=key)
-                if is_language(attempt, english_dict):
-                    possible_match = True
-                    print('Possible match with key {}:\n{}'.format(key, attempt[:140]))
-            if not possible_match:
-                print('Unable to find possible match.')
-                break
-        else:
-            print('There is no ciphertext.')
+    @classmethod
+    def solve_crib(cls, ciphertext, crib, offset=None):
+        ''' Returns (offset, key) for each offset and key under which crib,
+            known plaintext, lines up with ciphertext; see crib_offsets().
+            The multiplication key is solved from two aligned pairs whose
+            plain difference is invertible mod len(CHARS); if there are
+            none, each valid multiplication key is tried. '''
+        length = len(cls.CHARS)
+        solutions = []
+        for start in crib_offsets(ciphertext, crib, offset):
+            pairs = crib_pairs(ciphertext, crib, start, cls.CHARS)
+            if not pairs:
+                continue
+            (first_plain, first_cipher), *rest = pairs.items()
+            mult_keys = (1,) + affine_multipliers(length)
+            for plain, cipher in rest:
+                inverse = mod_inverse((plain - first_plain) % length, length)
+                if inverse is not None:
+                    mult_keys = [(cipher - first_cipher) * inverse % length]
+                    break
+            for mult_key in mult_keys:
+                add_key = (first_cipher - mult_key * first_plain) % length
+                if gcd(mult_key, length) == 1 and all(
+                        (mult_key * plain + add_key) % length == cipher
+                        for plain, cipher in rest):
+                    solutions.append((start, mult_key * length + add_key))
+        return solutions
+
+    @classmethod
+    def key_space(cls, ciphertext):
+        ''' Returns the keys .hack() tries, in order: every key whose
+            multiplication part is coprime with len(CHARS). '''
+        length = len(cls.CHARS)
+        return [key for key in range(length ** 2)
+                if gcd(key // length, length) == 1]
+
+    def rank_keys(self, ciphertext=None):
+        ''' Returns (key, score) pairs for every valid key, best first,
+            scored by the log-likelihood of the decrypted character
+            frequencies. Does not decrypt. '''
+        ciphertext = ciphertext or self.ciphertext
+        length = len(self.CHARS)
+        log_probs = english_log_probs(self.CHARS)
+        histogram = symbol_histogram(ciphertext, self.CHARS)
+        scores = []
+        for mult_key in range(1, length):
+            inverse_key = mod_inverse(mult_key, length)
+            if inverse_key is None:
+                continue
+            for add_key in range(length):
+                score = sum(count * log_probs[(index - add_key) *
+                                              inverse_key % length]
+                            for index, count in histogram)
+                scores.append((mult_key * length + add_key, score))
+        return sorted(scores, key=lambda pair: pair[1], reverse=True)
 
 
 class Substitution(Cipher):
-    ''' Contains encrypt, decrypt, and key gen methods for the Substitution
-        cipher. Can work as a poor man's (that is, insecure) one-time pad.
-        There is no hack method for this Cipher class, since hack methods
-        will be indeterminate. '''
+    ''' Contains encrypt, decrypt, key gen, and hack methods for the
+        Substitution cipher. Can work as a poor man's (that is, insecure)
+        one-time pad. The key space is too large to search, so .hack()
+        hill-climbs on quadgram statistics instead; its results are likely,
+        not certain. '''
     CHARS = string.printable
 
-    def gen_key(self):
-        ''' Returns a key as string equal to the character set (self.CHARS) of the
-            cipher. '''
-        key_popper = list(self.CHARS)
-        key_array = [key_popper.pop(random.randint(0, len(key_popper) - 1))
-                     for _ in range(len(self.CHARS))]
-        return ''.join(key_array)
+    @classmethod
+    def gen_key(cls, rng=None):
+        ''' Returns a key as string equal to the character set (cls.CHARS)
+            of the cipher, shuffled by rng as for Affine.gen_key(). '''
+        key = list(cls.CHARS)
+        (rng or random).shuffle(key)
+        return ''.join(key)
+
+    @classmethod
+    def solve_crib(cls, ciphertext, crib, offset=None):
+        ''' Returns (offset, mapping) for each offset where crib, known
+            plaintext, lines up with ciphertext; see crib_offsets().
+            mapping is the partial key it reveals, a dict from plain to
+            cipher character. Each cipher character must stand for one
+            plain character only. '''
+        solutions = []
+        for start in crib_offsets(ciphertext, crib, offset):
+            pairs = crib_pairs(ciphertext, crib, start, cls.CHARS)
+            if pairs is None or len(set(pairs.values())) != len(pairs):
+                continue
+            solutions.append((start, {cls.CHARS[plain]: cls.CHARS[cipher]
+                                      for plain, cipher in pairs.items()}))
+        return solutions
+
+    @classmethod
+    def translation(cls, key, decrypt=False):
+        ''' Returns (source, target) alphabets for key. Decryption looks up
+            each character's first position in key. '''
+        if decrypt:
+            target = [cls.CHARS[key.find(char)] for char in cls.CHARS]
+            return cls.CHARS, ''.join(target)
+        return cls.CHARS, key[:len(cls.CHARS)]
 
     def encrypt(self, plaintext=None, passed_key=None):
         ''' Encrypts using key. If no key set, raises AttributeError. '''
         plaintext = plaintext or self.message
         key = passed_key or self.key
         while key:
-            ciphertext = []
-            for char in plaintext:
-                if char in self.CHARS:
-                    ciphertext.append(key[self.CHARS.find(char)])
-                else:
-                    ciphertext.append(char)
-            return ''.join(ciphertext)
+            return plaintext.translate(cipher_table(type(self), key))
         else:
             raise AttributeError('Cannot encrypt without key.')
 
@@ -352,58 +1473,753 @@ class Substitution(Cipher):
         ciphertext = ciphertext or self.ciphertext
         key = passed_key or self.key
         while key:
-            plaintext = []
-            for char in ciphertext:
-                if char in self.CHARS:
-                    plaintext.append(self.CHARS[key.find(char)])
-                else:
-                    plaintext.append(char)
-            return ''.join(plaintext)
+            return ciphertext.translate(
+                cipher_table(type(self), key, decrypt=True))
         else:
             raise AttributeError('Cannot decript without key.')
 
+    def hack(self, model=None, restarts=8, iterations=20000, seed=None,
+             dictionary=None, stats=None):
+        ''' Searches for the key by hill climbing, scoring candidates with
+            model, a QuadgramModel over CHARS (default: .from_words() of
+            dictionary, or of english_dictionary()). The first climb starts from letter
+            frequencies; each of restarts more starts from the best key so
+            far with a few random swaps, and each climb tries at most
+            iterations swaps. Returns a HackResult for each distinct key
+            found, best first; the score is the model's log-likelihood.
+            Pass seed for repeatable runs, and a HackStats as stats to
+            count each climb as a key tried. '''
+        if not self.ciphertext:
+            raise AttributeError('There is no ciphertext. ')
+        if model is None:
+            model = QuadgramModel.from_words(
+                dictionary or english_dictionary(), self.CHARS)
+        if model.alphabet != self.CHARS:
+            raise ValueError('Model alphabet does not match CHARS.')
+        rng = random.Random(seed)
+        climber = _SubstitutionClimber(self.ciphertext, self.CHARS, model)
+
+        def climb(plain_of):
+            started = time.perf_counter()
+            result = climber.climb(plain_of, rng, iterations)
+            if stats is not None:
+                stats.keys_tried += 1
+                stats.elapsed_seconds += time.perf_counter() - started
+                stats.report()
+            return result
+
+        best = climb(climber.frequency_start())
+        results = [best]
+        for _ in range(restarts):
+            result = climb(climber.kick(best[1], rng, 3))
+            results.append(result)
+            best = max(best, result, key=itemgetter(0))
+        results.sort(key=itemgetter(0), reverse=True)
+        keys = {}
+        for score, plain_of in results:
+            keys.setdefault(climber.key(plain_of), score)
+        return [HackResult(key, score,
+                           self.decrypt(passed_key=key)[:PREVIEW_LENGTH])
+                for key, score in keys.items()]
+
+
+class _SubstitutionClimber:
+    ''' Hill climber for Substitution.hack(). A candidate is a decryption
+        mapping from cipher symbol to plain symbol, both alphabet indices.
+        Moves swap the plain symbols of two cipher symbols, and only the
+        quadgrams touching those symbols are rescored. '''
+
+    def __init__(self, ciphertext, alphabet, model):
+        self.alphabet = alphabet
+        self.size = len(alphabet)
+        self.quadgrams = model.quadgrams
+        self.plain_classes = [quadgram_class(char) for char in alphabet]
+        # Candidates are scored on quadgram classes plus each character's
+        # log probability given its class; adding plain unigrams instead
+        # would count the class twice and favour runs of punctuation.
+        self.frequencies = model.unigrams
+        class_totals = [0.0] * QUADGRAM_CLASSES
+        for plain, unigram in enumerate(model.unigrams):
+            class_totals[self.plain_classes[plain]] += math.exp(unigram)
+        self.unigrams = [unigram - math.log(class_totals[self.plain_classes[plain]])
+                         for plain, unigram in enumerate(model.unigrams)]
+        # Symbols outside the alphabet decrypt to themselves; they get index
+        # self.size and a fixed class.
+        self.symbols = [alphabet.find(char) if char in alphabet else self.size
+                        for char in ciphertext]
+        self.fixed_class = max((quadgram_class(char) for char in ciphertext
+                                if char not in alphabet), default=30)
+        self.counts = [0] * (self.size + 1)
+        self.touching = [set() for _ in range(self.size + 1)]
+        for position, symbol in enumerate(self.symbols):
+            self.counts[symbol] += 1
+            for start in range(max(position - 3, 0),
+                               min(position, len(self.symbols) - 4) + 1):
+                self.touching[symbol].add(start)
+        self.present = [symbol for symbol in range(self.size)
+                        if self.counts[symbol]]
+        # Every swap moving at least one present symbol, each pair once.
+        self.swaps = [(first, second) for first in self.present
+                      for second in range(self.size)
+                      if first != second
+                      and not (self.counts[second] and second < first)]
+
+    def quadgram_sum(self, classes, starts):
+        ''' Returns the quadgram score of the quadgrams at starts. '''
+        symbols, quadgrams, width = self.symbols, self.quadgrams, QUADGRAM_CLASSES
+        return sum(quadgrams[((classes[symbols[start]] * width +
+                               classes[symbols[start + 1]]) * width +
+                              classes[symbols[start + 2]]) * width +
+                             classes[symbols[start + 3]]]
+                   for start in starts)
+
+    def frequency_start(self):
+        ''' Returns the mapping pairing cipher symbols and plain symbols in
+            order of frequency. '''
+        by_frequency = sorted(range(self.size),
+                              key=lambda plain: self.frequencies[plain],
+                              reverse=True)
+        by_count = sorted(range(self.size),
+                          key=lambda symbol: self.counts[symbol], reverse=True)
+        plain_of = [0] * self.size
+        for symbol, plain in zip(by_count, by_frequency):
+            plain_of[symbol] = plain
+        return plain_of
+
+    def kick(self, plain_of, rng, swaps):
+        ''' Returns a copy of plain_of with swaps random swaps applied. '''
+        plain_of = list(plain_of)
+        for _ in range(swaps):
+            first_symbol = rng.choice(self.present)
+            second_symbol = rng.randrange(self.size)
+            plain_of[first_symbol], plain_of[second_symbol] = (
+                plain_of[second_symbol], plain_of[first_symbol])
+        return plain_of
+
+    def key(self, plain_of):
+        ''' Returns the Substitution key for decryption mapping plain_of. '''
+        key = [''] * self.size
+        for symbol, plain in enumerate(plain_of):
+            key[plain] = self.alphabet[symbol]
+        return ''.join(key)
+
+    def climb(self, plain_of, rng, iterations):
+        ''' Hill climbs from mapping plain_of, trying every swap in a
+            shuffled order until a full pass finds no improvement or
+            iterations swaps have been tried. Returns (score, mapping). '''
+        counts, unigrams, touching = self.counts, self.unigrams, self.touching
+        plain_of = list(plain_of)
+        classes = [self.plain_classes[plain] for plain in plain_of]
+        classes.append(self.fixed_class)
+        score = (self.quadgram_sum(classes, range(len(self.symbols) - 3)) +
+                 sum(counts[symbol] * unigrams[plain_of[symbol]]
+                     for symbol in self.present))
+
+        improved = True
+        while improved and iterations > 0:
+            improved = False
+            rng.shuffle(self.swaps)
+            for first_symbol, second_symbol in self.swaps[:iterations]:
+                first_plain = plain_of[first_symbol]
+                second_plain = plain_of[second_symbol]
+                delta = ((counts[first_symbol] - counts[second_symbol]) *
+                         (unigrams[second_plain] - unigrams[first_plain]))
+                first_class = classes[first_symbol]
+                second_class = classes[second_symbol]
+                if first_class != second_class:
+                    starts = touching[first_symbol] | touching[second_symbol]
+                    before = self.quadgram_sum(classes, starts)
+                    classes[first_symbol] = second_class
+                    classes[second_symbol] = first_class
+                    delta += self.quadgram_sum(classes, starts) - before
+                # Ignore rounding noise, or equal swaps could cycle forever.
+                if delta > 1e-9:
+                    plain_of[first_symbol] = second_plain
+                    plain_of[second_symbol] = first_plain
+                    score += delta
+                    improved = True
+                elif first_class != second_class:
+                    classes[first_symbol] = first_class
+                    classes[second_symbol] = second_class
+            iterations -= len(self.swaps)
+
+        return score, plain_of
+
 
 class Vegenere(Cipher):
     ''' Contains encrypt and decrypt methods for the Vegenère cipher. '''
     CHARS = string.printable
 
+    def stream_key(self, key, offset):
+        ''' Returns key rotated to the key position at offset. '''
+        position = offset % len(key)
+        return key[position:] + key[:position]
+
+    @classmethod
+    def crib_fragment(cls, ciphertext, crib, offset):
+        ''' Returns the key characters used at ciphertext positions offset
+            onward, read from crib, known plaintext, with None where the
+            crib character is outside CHARS; None if crib cannot line up
+            at offset. '''
+        size = len(cls.CHARS)
+        fragment = []
+        for plain, cipher in zip(crib, ciphertext[offset:offset + len(crib)]):
+            plain_index, cipher_index = cls.CHARS.find(plain), cls.CHARS.find(cipher)
+            if plain_index < 0 or cipher_index < 0:
+                if plain != cipher:
+                    return None
+                fragment.append(None)
+            else:
+                fragment.append(cls.CHARS[(cipher_index - plain_index) % size])
+        return fragment
+
+    @classmethod
+    def solve_crib(cls, ciphertext, crib, offset=None, max_length=None):
+        ''' Returns (offset, key) for each offset where crib, known
+            plaintext, repeats a key of at most max_length characters
+            (default: half the crib) at least twice; see crib_offsets().
+            The shortest such key is given, rotated to decrypt the whole
+            ciphertext. For a key fragment alone, see .crib_fragment(). '''
+        limit = len(crib) // 2
+        if max_length is not None:
+            limit = min(limit, max_length)
+        solutions = []
+        for start in crib_offsets(ciphertext, crib, offset):
+            fragment = cls.crib_fragment(ciphertext, crib, start)
+            if fragment is None:
+                continue
+            for period in range(1, limit + 1):
+                key = [None] * period
+                for index, key_char in enumerate(fragment):
+                    if key_char is None:
+                        continue
+                    position = (start + index) % period
+                    if key[position] is None:
+                        key[position] = key_char
+                    elif key[position] != key_char:
+                        break
+                else:
+                    if None not in key:
+                        solutions.append((start, ''.join(key)))
+                        break
+        return solutions
+
+    @classmethod
+    def transformer(cls, key, decrypt=False):
+        ''' Returns a function of one text that encrypts or decrypts it;
+            see Cipher.transformer(). Each key position has a cached
+            table, applied to its strided slice of text. '''
+        if not key:
+            raise AttributeError('Cannot encrypt or decrypt without key.')
+        sign = -1 if decrypt else 1
+        tables = [vigenere_table(cls.CHARS, sign * cls.CHARS.find(key_char))
+                  for key_char in key]
+        width = len(tables)
+
+        def transform(text):
+            if numpy is not None and len(text) >= NUMPY_THRESHOLD:
+                return vigenere_shift(text, key, cls.CHARS, sign)
+            shifted = list(text)
+            for col, table in enumerate(tables[:len(text)]):
+                shifted[col::width] = text[col::width].translate(table)
+            return ''.join(shifted)
+        return transform
+
+    def byte_transform(self, data, key, decrypt=False):
+        ''' Returns data encrypted, or decrypted if decrypt is set, with key
+            as bytes. '''
+        return vigenere_shift_bytes(data, key, self.CHARS,
+                                    sign=-1 if decrypt else 1)
+
     def encrypt(self, plaintext=None, passed_key=None):
         ''' Returns ciphertext from plaintext parameter.'''
-        ct, abc = [], self.CHARS    # ciphertext and alphabet
         key = passed_key or self.key
         plaintext = plaintext or self.message
         if not key:
             raise AttributeError('Key needed to encrypt.')
-        cm = zip(plaintext, cycle(key))  # ciphermatrix
-        for char, key_char in cm:
-            if char in abc:
-                ct.append(abc[(abc.find(char) + abc.find(key_char))
-                          % len(abc)])
-            else:
-                ct.append(char)
-        return ''.join(ct)
+        return vigenere_shift(plaintext, key, self.CHARS)
 
     def decrypt(self, ciphertext=None, passed_key=None):
         ''' Returns plaintext from ciphertext parameter.'''
-        pt, abc = [], self.CHARS  # plaintext and alphabet
         key = passed_key or self.key
         ciphertext = ciphertext or self.ciphertext
         if not key:
             raise AttributeError('Key needed to decrypt.')
-        cm = zip(ciphertext, cycle(key))
-        for char, key_char in cm:
-            if char in abc:
-                pt.append(abc[(abc.find(char) - abc.find(key_char))
-                          % len(abc)])
-            else:
-                pt.append(char)
-        return ''.join(pt)
+        return vigenere_shift(ciphertext, key, self.CHARS, sign=-1)
+
+    @classmethod
+    def key_lengths(cls, ciphertext, max_length=20):
+        ''' Returns key lengths up to max_length, most likely first, ranked
+            by the mean index of coincidence of the columns each length
+            splits ciphertext into. Multiples of the true length score as
+            well as it does, so a length goes after the rest if one of its
+            divisors scores at least 90% as well. '''
+        scores = {}
+        for length in range(1, min(max_length, len(ciphertext)) + 1):
+            columns = [ciphertext[col::length] for col in range(length)]
+            scores[length] = sum(index_of_coincidence(column, cls.CHARS)
+                                 for column in columns) / length
+
+        def rank(length):
+            multiple = any(scores[divisor] >= 0.9 * scores[length]
+                           for divisor in range(2, length)
+                           if length % divisor == 0)
+            return multiple, -scores[length]
+        return sorted(scores, key=rank)
+
+    def rank_keys(self, ciphertext=None, max_length=20, lengths=3, top=10):
+        ''' Returns (key, score) pairs for the top keys of each of the
+            lengths likeliest key lengths. Each key column is solved as a
+            Caesar shift by the log-likelihood of its decrypted character
+            frequencies, so nothing is decrypted. Keys that repeat a
+            shorter key are reported once, at the shorter length. '''
+        ciphertext = ciphertext or self.ciphertext
+        size = len(self.CHARS)
+        log_probs = english_log_probs(self.CHARS)
+        results, seen = [], set()
+        for length in self.key_lengths(ciphertext, max_length)[:lengths]:
+            columns = []
+            for col in range(length):
+                histogram = symbol_histogram(ciphertext[col::length],
+                                             self.CHARS)
+                scores = [(shift, sum(count * log_probs[(index - shift) % size]
+                                      for index, count in histogram))
+                          for shift in range(size)]
+                columns.append(sorted(scores, key=itemgetter(1),
+                                      reverse=True))
+            best = sum(column[0][1] for column in columns)
+            ranked = [[score for _, score in column] for column in columns]
+            for loss, choice in best_combinations(ranked, top):
+                key = ''.join(self.CHARS[columns[col][option][0]]
+                              for col, option in enumerate(choice))
+                for period in range(1, length + 1):
+                    if length % period == 0 and \
+                            key[:period] * (length // period) == key:
+                        key = key[:period]
+                        break
+                if key not in seen:
+                    seen.add(key)
+                    results.append((key, best - loss))
+        return results
+
+    def hack(self, dictionary=None, max_length=20, lengths=3, top=10,
+             stats=None, cache=None, early_exit=False):
+        ''' Checks the keys from .rank_keys() against dictionary; returns a
+            HackResult for each key whose decryption passes is_language(),
+            best first. Other arguments are as for Cipher.hack(). '''
+        if not self.ciphertext:
+            raise AttributeError('There is no ciphertext. ')
+        dictionary = dictionary or english_dictionary()
+
+        def search():
+            keys = [key for key, _ in self.rank_keys(
+                max_length=max_length, lengths=lengths, top=top)]
+            return HackResult.rank(search_keys(
+                type(self), self.ciphertext, dictionary, keys, stats=stats,
+                early_exit=early_exit), dictionary)
+        options = {'max_length': max_length, 'lengths': lengths, 'top': top,
+                   'early_exit': early_exit}
+        return cached_hack(cache, type(self), self.ciphertext, dictionary,
+                           options, search)
+
+
+# Hack results and instrumentation. Dictionary-checked hacks score each
+# match by its fraction of dictionary words. A HackStats passed to a hack
+# or to search_keys() counts keys tried, matches, and early rejections,
+# and times the decrypt and is_language() steps apart; its callback, if
+# any, gets the stats after every chunk of keys, to feed a metrics system.
+PREVIEW_LENGTH = 140
+STATS_INTERVAL = 256
+
+
+class HackResult(namedtuple('HackResult', ['key', 'score', 'preview'])):
+    ''' A candidate key found by .hack(), its score (higher is better),
+        and the first PREVIEW_LENGTH characters of its decryption. '''
+    __slots__ = ()
+
+    @classmethod
+    def rank(cls, matches, dictionary):
+        ''' Returns HackResults for (key, plaintext) matches, scored by
+            words_in_dict() and sorted best first; ties keep their order. '''
+        results = [cls(key, words_in_dict(attempt, dictionary),
+                       attempt[:PREVIEW_LENGTH])
+                   for key, attempt in matches]
+        return sorted(results, key=itemgetter(1), reverse=True)
+
+
+class HackStats:
+    ''' Counters and timers for key searches. callback, if given, is
+        called with the stats as they update. '''
+    COUNTERS = ('keys_tried', 'matches', 'early_rejections',
+                'decrypt_seconds', 'score_seconds', 'elapsed_seconds')
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+
+    @property
+    def keys_per_second(self):
+        ''' Returns keys tried per second of elapsed time. '''
+        return self.keys_tried / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def merge(self, other):
+        ''' Adds the counters of other, such as a worker's stats. '''
+        for name in self.COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def as_dict(self):
+        ''' Returns counters and keys_per_second as a dict. '''
+        counters = {name: getattr(self, name) for name in self.COUNTERS}
+        counters['keys_per_second'] = self.keys_per_second
+        return counters
+
+    def report(self):
+        ''' Calls callback, if any, with the stats. '''
+        if self.callback is not None:
+            self.callback(self)
+
+    def __getstate__(self):
+        ''' Pickles counters only; callbacks stay in their process. '''
+        return {name: getattr(self, name) for name in self.COUNTERS}
+
+    def __setstate__(self, state):
+        self.callback = None
+        self.__dict__.update(state)
+
+
+# Hack result cache. A HackCache keeps the results of hacks it has seen,
+# keyed by a digest of the cipher class, its alphabet, the ciphertext,
+# the hack options, and a version of the dictionary, in an LRU of at most
+# max_entries results. Given a path, it also keeps every result in a
+# sqlite3 database there, so results outlive the process. hashlib, json
+# and sqlite3 are imported on first use, so encrypting never loads them
+# and Python builds without sqlite3 can still use the LRU. Dictionaries
+# are versioned by content once and then by identity, so a dictionary
+# must not change after a cached hack has used it.
+_dictionary_versions = {}
+
+
+def dictionary_version(dictionary):
+    ''' Returns a digest of the words in dictionary. '''
+    import hashlib
+    if isinstance(dictionary, CompiledDictionary):
+        words = dictionary._view
+    else:
+        words = '\n'.join(sorted(dictionary)).encode('utf-8')
+    return hashlib.sha256(words).hexdigest()
+
+
+def _cached_version(dictionary):
+    ''' Returns dictionary_version(dictionary), computed once for as long
+        as dictionary lives. '''
+    entry = _dictionary_versions.get(id(dictionary))
+    if entry is not None and entry[0]() is dictionary:
+        return entry[1]
+    version = dictionary_version(dictionary)
+    key = id(dictionary)
+    try:
+        reference = weakref.ref(
+            dictionary, lambda _: _dictionary_versions.pop(key, None))
+    except TypeError:
+        # Not weakly referenceable (a dict, say); version it every time.
+        return version
+    _dictionary_versions[key] = (reference, version)
+    return version
+
+
+def cached_hack(cache, cipher, ciphertext, dictionary, options, search):
+    ''' Returns search(), or its cached result if cache has one for these
+        arguments; without a cache, just search(). '''
+    if cache is None:
+        return search()
+    return cache.fetch(cipher, ciphertext, dictionary, options, search)
+
+
+class HackCache:
+    ''' LRU of hack results, optionally backed by a sqlite3 database at
+        path. hits, disk_hits, and misses count lookups; disk_hits are the
+        hits the database answered. Safe to share between threads. '''
+
+    def __init__(self, max_entries=1024, path=None):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._database = None
+        if path is not None:
+            import sqlite3
+            self._database = sqlite3.connect(path, check_same_thread=False)
+            self._database.execute('CREATE TABLE IF NOT EXISTS hacks '
+                                   '(digest TEXT PRIMARY KEY, results TEXT)')
+            self._database.commit()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def digest(self, cipher, ciphertext, dictionary, options=None):
+        ''' Returns the cache key for a hack of ciphertext by cipher. '''
+        import hashlib
+        import json
+        alphabet = getattr(cipher, 'CHARS', getattr(cipher, 'LETTERS', ''))
+        header = json.dumps([cipher.__module__, cipher.__qualname__, alphabet,
+                             _cached_version(dictionary), options or {}],
+                            sort_keys=True)
+        digest = hashlib.sha256(header.encode('utf-8'))
+        digest.update(ciphertext.encode('utf-8', 'surrogatepass'))
+        return digest.hexdigest()
+
+    def fetch(self, cipher, ciphertext, dictionary, options, search):
+        ''' Returns cached results for these arguments, or stores and
+            returns search(). '''
+        digest = self.digest(cipher, ciphertext, dictionary, options)
+        results = self.get(digest)
+        if results is None:
+            results = search()
+            self.put(digest, results)
+        return results
+
+    def get(self, digest):
+        ''' Returns the list of HackResults stored under digest, or None. '''
+        import json
+        with self._lock:
+            results = self._entries.get(digest)
+            if results is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return list(results)
+            if self._database is not None:
+                row = self._database.execute(
+                    'SELECT results FROM hacks WHERE digest = ?',
+                    (digest,)).fetchone()
+                if row is not None:
+                    results = [HackResult(*result)
+                               for result in json.loads(row[0])]
+                    self._remember(digest, results)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return list(results)
+            self.misses += 1
+            return None
+
+    def put(self, digest, results):
+        ''' Stores the list of HackResults results under digest. '''
+        import json
+        with self._lock:
+            self._remember(digest, list(results))
+            if self._database is not None:
+                self._database.execute(
+                    'INSERT OR REPLACE INTO hacks VALUES (?, ?)',
+                    (digest, json.dumps(results)))
+                self._database.commit()
+
+    def stats(self):
+        ''' Returns a dict of counters and sizes, to help size the cache. '''
+        return {'hits': self.hits, 'disk_hits': self.disk_hits,
+                'misses': self.misses, 'entries': len(self._entries),
+                'max_entries': self.max_entries}
+
+    def close(self):
+        ''' Closes the database, if any. '''
+        if self._database is not None:
+            self._database.close()
+            self._database = None
+
+    def _remember(self, digest, results):
+        ''' Adds results to the LRU, evicting the oldest past max_entries. '''
+        self._entries[digest] = results
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+def table_cache_info():
+    ''' Returns hit and miss counters, as dicts, for the cached tables
+        behind encryption and decryption, by function name. '''
+    return {function.__name__: function.cache_info()._asdict()
+            for function in (cipher_table, cipher_byte_table,
+                             vigenere_table, vigenere_byte_table,
+                             transposition_columns, transposition_order,
+                             mod_inverse)}
+
+
+# Key-space search. search_keys() decrypts ciphertext under each key and
+# yields the (key, plaintext) pairs that pass is_language(). With workers,
+# the keys are split into chunks across a process pool; the cipher class,
+# ciphertext, and dictionary reach each worker once, through the pool
+# initializer, and only key chunks and matches cross process boundaries.
+_search_state = {}
+
+
+# Early exit, off unless asked for. On long ciphertexts, each key first
+# decrypts only its first PREFIX_LENGTH characters, and keys whose prefix is
+# not plausible are rejected without a full decrypt or dictionary scan. The
+# prefix test is looser than is_language()'s defaults, but it only sees the
+# opening: a text that opens with a header, a table or numbers can pass
+# is_language() as a whole and still be rejected, so the screen trades
+# those keys for speed.
+EARLY_EXIT_LENGTH = 1024
+PREFIX_LENGTH = 160
+PREFIX_WORD_PERCENT = 10
+PREFIX_LETTER_PERCENT = 70
+
+
+def plausible_prefix(prefix, dictionary):
+    ''' Returns True if prefix, cut back to its last whole word, could
+        open a text that passes is_language(). '''
+    if prefix is None:
+        return False
+    cut = max(prefix.rfind(' '), prefix.rfind('\n'))
+    if cut > 0:
+        prefix = prefix[:cut]
+    return is_language(prefix, dictionary, PREFIX_WORD_PERCENT,
+                       PREFIX_LETTER_PERCENT)
+
+
+def _init_search_worker(cipher, ciphertext, dictionary, early_exit):
+    ''' Stores search inputs in a worker process. '''
+    _search_state.update(cipher=cipher(), ciphertext=ciphertext,
+                         dictionary=dictionary, early_exit=early_exit)
+
+
+def _search_chunk(keys, timed=False):
+    ''' Returns (matches, stats) for keys, using worker state; stats is a
+        HackStats if timed is set, else None. '''
+    stats = HackStats() if timed else None
+    matches = list(_match_keys(_search_state['cipher'],
+                               _search_state['ciphertext'],
+                               _search_state['dictionary'], keys, stats,
+                               _search_state['early_exit']))
+    return matches, stats
+
+
+def _match_keys(cipher, ciphertext, dictionary, keys, stats=None,
+                early_exit=False):
+    ''' Yields (key, plaintext) for keys whose decryption is_language().
+        With early_exit, ciphertexts of EARLY_EXIT_LENGTH or more are
+        screened first; see plausible_prefix(). With stats, each step is
+        counted and timed. '''
+    screen = early_exit and len(ciphertext) >= EARLY_EXIT_LENGTH
+    if stats is None:
+        for key in keys:
+            if screen and not plausible_prefix(cipher.decrypt_prefix(
+                    ciphertext, PREFIX_LENGTH, passed_key=key), dictionary):
+                continue
+            attempt = cipher.decrypt(ciphertext, passed_key=key)
+            if attempt and is_language(attempt, dictionary):
+                yield key, attempt
+        return
+
+    clock = time.perf_counter
+    for key in keys:
+        stats.keys_tried += 1
+        if screen:
+            started = clock()
+            prefix = cipher.decrypt_prefix(ciphertext, PREFIX_LENGTH,
+                                           passed_key=key)
+            decrypted = clock()
+            plausible = plausible_prefix(prefix, dictionary)
+            stats.decrypt_seconds += decrypted - started
+            stats.score_seconds += clock() - decrypted
+            if not plausible:
+                stats.early_rejections += 1
+                continue
+        started = clock()
+        attempt = cipher.decrypt(ciphertext, passed_key=key)
+        decrypted = clock()
+        match = bool(attempt) and is_language(attempt, dictionary)
+        stats.decrypt_seconds += decrypted - started
+        stats.score_seconds += clock() - decrypted
+        if match:
+            stats.matches += 1
+            yield key, attempt
+
+
+def search_keys(cipher, ciphertext, dictionary, keys=None, workers=None,
+                chunk_size=None, max_matches=None, stats=None,
+                early_exit=False):
+    ''' Yields (key, plaintext) for each key in keys (default: the cipher
+        class's .key_space()) whose decryption is_language(). Serial and
+        in key order unless workers > 1, in which case matches arrive as
+        worker chunks finish. Stops after max_matches matches if given.
+        Pass a HackStats as stats to count and time the search. With
+        early_exit, keys for long ciphertexts are first screened on their
+        decrypted opening, which is faster but can miss a key whose
+        plaintext opens with something other than prose; see
+        plausible_prefix(). '''
+    if keys is None:
+        keys = cipher.key_space(ciphertext)
+    started = time.perf_counter()
+    try:
+        if not workers or workers == 1:
+            yield from _search_serial(cipher, ciphertext, dictionary, keys,
+                                      max_matches, stats, early_exit)
+        else:
+            yield from _search_parallel(cipher, ciphertext, dictionary, keys,
+                                        workers, chunk_size, max_matches,
+                                        stats, early_exit)
+    finally:
+        if stats is not None:
+            stats.elapsed_seconds += time.perf_counter() - started
+            stats.report()
+
+
+def _search_serial(cipher, ciphertext, dictionary, keys, max_matches, stats,
+                   early_exit):
+    ''' Serial search_keys(); reports stats every STATS_INTERVAL keys. '''
+    found = 0
+    instance = cipher()
+    keys = iter(keys)
+    while True:
+        chunk = list(islice(keys, STATS_INTERVAL))
+        if not chunk:
+            return
+        for match in _match_keys(instance, ciphertext, dictionary, chunk,
+                                 stats, early_exit):
+            yield match
+            found += 1
+            if max_matches and found >= max_matches:
+                return
+        if stats is not None:
+            stats.report()
+
+
+def _search_parallel(cipher, ciphertext, dictionary, keys, workers,
+                     chunk_size, max_matches, stats, early_exit):
+    ''' Process-pool search_keys(); merges worker stats per chunk. '''
+    found = 0
+    keys = list(keys) if not isinstance(keys, (list, range)) else keys
+    if chunk_size is None:
+        # A few chunks per worker balances load without much overhead.
+        chunk_size = max(1, math.ceil(len(keys) / (workers * 4)))
+    executor = ProcessPoolExecutor(max_workers=workers,
+                                   initializer=_init_search_worker,
+                                   initargs=(cipher, ciphertext, dictionary,
+                                             early_exit))
+    try:
+        futures = [executor.submit(_search_chunk,
+                                   keys[start:start + chunk_size],
+                                   stats is not None)
+                   for start in range(0, len(keys), chunk_size)]
+        for future in as_completed(futures):
+            matches, chunk_stats = future.result()
+            if stats is not None:
+                stats.merge(chunk_stats)
+                stats.report()
+            for match in matches:
+                yield match
+                found += 1
+                if max_matches and found >= max_matches:
+                    return
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
 
 
 # The main loop
 if __name__ == '__main__':
-    print('''This package currently encrypts, decrypts, and hacks
-             Caesar, Transposition, and Affine ciphers. Encryption
-             and decryption methods are available for Substitution
-             and Vegenère (Vegenere) ciphers.''')
-    english_dict = load_dictionary()
+    print('''This package encrypts, decrypts, and hacks Caesar,
+             Transposition, Affine, Substitution, and Vegenère
+             (Vegenere) ciphers. For the command line tool, run
+             historical-ciphers --help once the package is installed.''')
@@ -0,0 +1,393 @@
+# Asyncio front end for historical_ciphers.
+#
+# encrypt() and decrypt() are coroutines for every Cipher subclass; long
+# texts are transformed in an executor so the event loop stays free.
+# JobManager runs each crack job as one crack() call in an executor: the
+# cipher's own .hack(), with its key limits, scores and options. The hack's
+# HackStats callback sends keys tried back through a queue, which the event
+# loop turns into progress events, and raises CrackCancelled once the job
+# is cancelled. Only module-level functions and plain data go to the
+# executor, so it can be a process pool, which keeps CPU-heavy cracks from
+# competing with the event loop for the GIL; the queue and cancel flag then
+# live in a multiprocessing manager. serve() and Client speak JSON lines
+# over a local socket, so one event loop can serve many clients at once.
+
+import asyncio
+import itertools
+import json
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from historical_ciphers import *
+
+CIPHERS = {cipher.__name__: cipher
+           for cipher in (Caesar, Transposition, Affine, Substitution,
+                          Vegenere)}
+
+# Texts at least this long are encrypted or decrypted in the executor.
+EXECUTOR_THRESHOLD = 1 << 16
+# Seconds between checks for progress of a running crack.
+PROGRESS_INTERVAL = 0.05
+
+
+async def encrypt(cipher, text, key, executor=None):
+    ''' Returns text encrypted with key by cipher class. '''
+    return await _transform(cipher, text, key, False, executor)
+
+
+async def decrypt(cipher, text, key, executor=None):
+    ''' Returns text decrypted with key by cipher class. '''
+    return await _transform(cipher, text, key, True, executor)
+
+
+async def _transform(cipher, text, key, decrypt, executor):
+    ''' Runs cipher's transformer inline, or in executor for long text. '''
+    transform = cipher.transformer(key, decrypt)
+    if len(text) < EXECUTOR_THRESHOLD:
+        return transform(text)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, transform, text)
+
+
+class CrackCancelled(Exception):
+    ''' Raised inside a crack whose job was cancelled. '''
+
+
+class JobProgress:
+    ''' HackStats callback for a crack in an executor. Puts keys tried on
+        updates, and raises CrackCancelled once cancelled is set. '''
+
+    def __init__(self, updates, cancelled):
+        self.updates = updates
+        self.cancelled = cancelled
+
+    def __call__(self, stats):
+        if self.cancelled.is_set():
+            raise CrackCancelled()
+        self.updates.put(stats.keys_tried)
+
+
+def crack(cipher, ciphertext, dictionary, model, options, progress):
+    ''' Returns cipher's .hack() of ciphertext, a list of HackResults.
+        options are keyword arguments for .hack(); progress is the
+        HackStats callback. Substitution uses model, or one trained on
+        dictionary. '''
+    instance = cipher(ciphertext=ciphertext)
+    stats = HackStats(progress)
+    if cipher is Substitution:
+        return instance.hack(model, dictionary=dictionary, stats=stats,
+                             **options)
+    return instance.hack(dictionary, stats=stats, **options)
+
+
+class CrackJob:
+    ''' A crack of ciphertext by cipher class, run by a JobManager. state
+        is one of 'pending', 'running', 'done', 'cancelled' or 'failed'.
+        .events() yields event dicts, once, until the job finishes. '''
+    FINISHED = ('done', 'cancelled', 'failed')
+
+    def __init__(self, job_id, cipher, ciphertext, options):
+        self.id = job_id
+        self.cipher = cipher
+        self.ciphertext = ciphertext
+        self.options = options
+        self.state = 'pending'
+        self.tried = 0
+        self.results = []
+        self._events = asyncio.Queue()
+        self._cancelled = False
+        self._cancel_event = None
+        self._task = None
+
+    def cancel(self):
+        ''' Asks the job to stop at its next progress report. Returns
+            False if the job had already finished. '''
+        if self.state in self.FINISHED:
+            return False
+        self._cancelled = True
+        if self._cancel_event is not None:
+            self._cancel_event.set()
+        return True
+
+    async def wait(self):
+        ''' Waits for the job to finish; returns its HackResults. '''
+        await asyncio.shield(self._task)
+        return self.results
+
+    async def events(self):
+        ''' Yields {'type': 'progress', 'tried'} events while the crack
+            runs, a {'type': 'candidate', 'key', 'score', 'preview'} event
+            per HackResult, best first, then one of {'type': 'done'},
+            {'type': 'cancelled'} or {'type': 'failed', 'message'}. '''
+        while True:
+            event = await self._events.get()
+            yield event
+            if event['type'] in self.FINISHED:
+                return
+
+    def _post(self, event):
+        ''' Records event and queues it for .events(). Loop thread only. '''
+        if event['type'] == 'progress':
+            self.tried = event['tried']
+        elif event['type'] == 'candidate':
+            self.results.append(HackResult(event['key'], event['score'],
+                                           event['preview']))
+        self._events.put_nowait(event)
+
+
+class JobManager:
+    ''' Starts and tracks CrackJobs. Cracks run in executor (default: the
+        event loop's thread pool), which may be a thread or process pool,
+        and check candidates against dictionary; Substitution cracks use
+        model, a QuadgramModel, or one trained on dictionary. Results are
+        kept in cache, a HackCache, if given. Call .close() when done. '''
+
+    def __init__(self, dictionary=None, model=None, executor=None,
+                 cache=None):
+        self.dictionary = dictionary
+        self.model = model
+        self.executor = executor
+        self.cache = cache
+        self.jobs = {}
+        self._ids = itertools.count(1)
+        self._sync_manager = None
+
+    def submit(self, cipher, ciphertext, options=None):
+        ''' Returns a started CrackJob; options are keyword arguments for
+            the cipher's .hack(), such as top or early_exit. Call from the
+            event loop. '''
+        job = CrackJob(next(self._ids), cipher, ciphertext,
+                       dict(options or {}))
+        self.jobs[job.id] = job
+        job._task = asyncio.ensure_future(self._run(job))
+        return job
+
+    def cancel(self, job_id):
+        ''' Cancels job job_id; returns False if unknown or finished. '''
+        job = self.jobs.get(job_id)
+        return job is not None and job.cancel()
+
+    def close(self):
+        ''' Stops the multiprocessing manager, if a process pool needed
+            one. '''
+        if self._sync_manager is not None:
+            self._sync_manager.shutdown()
+            self._sync_manager = None
+
+    def _channel(self):
+        ''' Returns (updates queue, cancel event) that a crack can reach
+            from the executor. '''
+        if isinstance(self.executor, ProcessPoolExecutor):
+            if self._sync_manager is None:
+                self._sync_manager = multiprocessing.Manager()
+            return self._sync_manager.Queue(), self._sync_manager.Event()
+        return queue.Queue(), threading.Event()
+
+    async def _run(self, job):
+        ''' Runs job's crack, or takes its results from the cache, and
+            posts its candidates and final event. '''
+        job.state = 'running'
+        try:
+            dictionary = self.dictionary or english_dictionary()
+            results = digest = None
+            if self.cache is not None:
+                digest = self.cache.digest(job.cipher, job.ciphertext,
+                                           dictionary, job.options)
+                results = self.cache.get(digest)
+            if results is None:
+                results = await self._crack(job, dictionary)
+                if self.cache is not None:
+                    self.cache.put(digest, results)
+            for result in results:
+                job._post({'type': 'candidate', 'key': result.key,
+                           'score': result.score, 'preview': result.preview})
+        except CrackCancelled:
+            job.state = 'cancelled'
+            job._post({'type': 'cancelled'})
+        except Exception as error:
+            job.state = 'failed'
+            job._post({'type': 'failed', 'message': str(error)})
+        else:
+            job.state = 'done'
+            job._post({'type': 'done'})
+
+    async def _crack(self, job, dictionary):
+        ''' Runs crack() for job in the executor, posting progress until
+            it returns. '''
+        updates, job._cancel_event = self._channel()
+        if job._cancelled:
+            raise CrackCancelled()
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self.executor, crack, job.cipher, job.ciphertext, dictionary,
+            self.model, job.options, JobProgress(updates, job._cancel_event))
+        while True:
+            finished, _ = await asyncio.wait([future],
+                                             timeout=PROGRESS_INTERVAL)
+            while True:
+                try:
+                    tried = updates.get_nowait()
+                except queue.Empty:
+                    break
+                job._post({'type': 'progress', 'tried': tried})
+            if finished:
+                return future.result()
+
+
+# JSON lines protocol. Every request carries an id, which every response
+# to it repeats. Requests:
+#   {'id', 'op': 'encrypt' or 'decrypt', 'cipher', 'text', 'key'}
+#       -> {'id', 'type': 'result', 'text'}
+#   {'id', 'op': 'crack', 'cipher', 'text', optional 'options'}
+#       -> {'id', 'type': 'job', 'job'}, then each event of the job
+#   {'id', 'op': 'cancel', 'job'} -> {'id', 'type': 'result', 'cancelled'}
+# Bad requests get {'id', 'type': 'error', 'message'}.
+async def serve(manager=None, host='127.0.0.1', port=0):
+    ''' Starts and returns an asyncio server on host and port (default: a
+        free port; see server.sockets[0].getsockname()). '''
+    manager = manager or JobManager()
+
+    async def handle(reader, writer):
+        lock = asyncio.Lock()
+        tasks = set()
+
+        async def send(response):
+            async with lock:
+                writer.write(json.dumps(response).encode('utf-8') + b'\n')
+                await writer.drain()
+
+        async def answer(line):
+            request_id = None
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError('Request is not a JSON object.')
+                request_id = request.get('id')
+                op = request['op']
+                if op == 'cancel':
+                    await send({'id': request_id, 'type': 'result',
+                                'cancelled': manager.cancel(request['job'])})
+                    return
+                cipher = CIPHERS[request['cipher']]
+                if op in ('encrypt', 'decrypt'):
+                    transform = encrypt if op == 'encrypt' else decrypt
+                    text = await transform(cipher, request['text'],
+                                           request['key'])
+                    await send({'id': request_id, 'type': 'result',
+                                'text': text})
+                elif op == 'crack':
+                    job = manager.submit(cipher, request['text'],
+                                         request.get('options'))
+                    await send({'id': request_id, 'type': 'job',
+                                'job': job.id})
+                    async for event in job.events():
+                        await send(dict(event, id=request_id))
+                else:
+                    raise ValueError('Unknown op {!r}.'.format(op))
+            except Exception as error:
+                await send({'id': request_id, 'type': 'error',
+                            'message': '{}: {}'.format(
+                                type(error).__name__, error)})
+
+        try:
+            async for line in reader:
+                task = asyncio.ensure_future(answer(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+class Client:
+    ''' Client for serve(). Requests may run concurrently over one
+        connection. Make with Client.connect(). '''
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self._ids = itertools.count(1)
+        self._replies = {}
+        self._listener = asyncio.ensure_future(self._listen())
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=None):
+        ''' Returns a Client connected to host and port. '''
+        return cls(*await asyncio.open_connection(host, port))
+
+    async def encrypt(self, cipher, text, key):
+        ''' Returns text encrypted by the server; cipher is a class name. '''
+        return (await self._call(op='encrypt', cipher=cipher, text=text,
+                                 key=key))['text']
+
+    async def decrypt(self, cipher, text, key):
+        ''' Returns text decrypted by the server; cipher is a class name. '''
+        return (await self._call(op='decrypt', cipher=cipher, text=text,
+                                 key=key))['text']
+
+    async def cancel(self, job_id):
+        ''' Cancels crack job job_id; returns False if it had finished. '''
+        return (await self._call(op='cancel', job=job_id))['cancelled']
+
+    async def crack(self, cipher, ciphertext, **options):
+        ''' Yields the events of a crack job: first {'type': 'job', 'job'},
+            then those of CrackJob.events(). options are passed to the
+            cipher's .hack(). '''
+        request_id, replies = self._send(op='crack', cipher=cipher,
+                                         text=ciphertext, options=options)
+        try:
+            while True:
+                event = await self._receive(replies)
+                yield event
+                if event['type'] in CrackJob.FINISHED:
+                    return
+        finally:
+            del self._replies[request_id]
+
+    async def close(self):
+        ''' Closes the connection. '''
+        self._listener.cancel()
+        self._writer.close()
+        await self._writer.wait_closed()
+
+    async def _call(self, **request):
+        ''' Sends request and returns its one response. '''
+        request_id, replies = self._send(**request)
+        try:
+            return await self._receive(replies)
+        finally:
+            del self._replies[request_id]
+
+    def _send(self, **request):
+        ''' Sends request; returns (id, queue its responses arrive on). '''
+        request['id'] = next(self._ids)
+        replies = self._replies[request['id']] = asyncio.Queue()
+        self._writer.write(json.dumps(request).encode('utf-8') + b'\n')
+        return request['id'], replies
+
+    async def _receive(self, replies):
+        ''' Returns the next response from replies; raises ValueError for
+            error responses and ConnectionError if the server went away. '''
+        response = await replies.get()
+        if response is None:
+            raise ConnectionError('Server closed the connection.')
+        if response['type'] == 'error':
+            raise ValueError(response['message'])
+        return response
+
+    async def _listen(self):
+        ''' Routes each response to the queue of its request. '''
+        try:
+            async for line in self._reader:
+                response = json.loads(line)
+                replies = self._replies.get(response.get('id'))
+                if replies is not None:
+                    replies.put_nowait(response)
+        finally:
+            for replies in self._replies.values():
+                replies.put_nowait(None)
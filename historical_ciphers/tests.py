@@ -1,6 +1,20 @@
-import unittest
+import asyncio
+import contextlib
+import io
+import json
+import mmap
+import os
 import random
+import subprocess
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
 from historical_ciphers import *
+from historical_ciphers import (_BIGRAM_INDEX, _transposition_scores_numpy,
+                                _vigenere_shift_python)
+import cli
+import service
 
 test_message = """This is the default test_message that I am using to run 
              through unit tests. It is plain. It is boring. 
@@ -12,6 +26,52 @@ test_message = """This is the default test_message that I am using to run
              and even some punctution:
              ~!@#$%^&*()_+=-`{}|:<>?'\" <>?,./=/*."""
 
+english_message = """It was the best of times, it was the worst of times, it was the
+             age of wisdom, it was the age of foolishness, it was the epoch
+             of belief, it was the epoch of incredulity, it was the season of
+             Light, it was the season of Darkness, it was the spring of hope,
+             it was the winter of despair."""
+english_words = set(word.strip(',.').upper()
+                    for word in english_message.split())
+
+prose_message = """It is a truth universally acknowledged, that a single man in
+             possession of a good fortune, must be in want of a wife. However
+             little known the feelings or views of such a man may be on his
+             first entering a neighbourhood, this truth is so well fixed in
+             the minds of the surrounding families, that he is considered the
+             rightful property of some one or other of their daughters. My
+             dear Mr. Bennet, said his lady to him one day, have you heard
+             that Netherfield Park is let at last? Mr. Bennet replied that he
+             had not. But it is, returned she; for Mrs. Long has just been
+             here, and she told me all about it. Mr. Bennet made no answer.
+             Do you not want to know who has taken it? cried his wife
+             impatiently. You want to tell me, and I have no objection to
+             hearing it. This was invitation enough."""
+
+sea_message = """Call me Ishmael. Some years ago, never mind how long
+             precisely, having little or no money in my purse, and nothing
+             particular to interest me on shore, I thought I would sail about
+             a little and see the watery part of the world. It is a way I
+             have of driving off the spleen and regulating the circulation.
+             Whenever I find myself growing grim about the mouth; whenever it
+             is a damp, drizzly November in my soul; whenever I find myself
+             involuntarily pausing before coffin warehouses, and bringing up
+             the rear of every funeral I meet; then, I account it high time
+             to get to sea as soon as I can. This is my substitute for pistol
+             and ball. With a philosophical flourish Cato throws himself upon
+             his sword; I quietly take to the ship. There is nothing
+             surprising in this. If they but knew it, almost all men in their
+             degree, some time or other, cherish very nearly the same
+             feelings towards the ocean with me."""
+
+# A fixed key for every cipher, shared by the tests that run each cipher
+# the same way. Transposition cannot stream or work on bytes, so
+# stream_keys leaves it out.
+substitution_key = Substitution.gen_key(random.Random(0))
+stream_keys = ((Caesar, 8), (Affine, 3399), (Substitution, substitution_key),
+               (Vegenere, 'LEMON'))
+cipher_keys = stream_keys + ((Transposition, 8),)
+
 
 class DefaultTests(unittest.TestCase):
     ''' Test to see if automatic encryption works. I have defaulted to a key
@@ -72,6 +132,125 @@ class Transposition_cipher_range_keys(unittest.TestCase):
             self.assertEqual(transposition_test.decrypt(), test_message)
 
 
+class Transposition_batch_test(unittest.TestCase):
+    ''' Test applying one cached permutation to many messages. '''
+
+    def test_Transposition_permute_batch(self):
+        messages = [test_message, test_message[::-1], test_message.upper()]
+        ciphertexts = Transposition.permute_batch(messages, 8)
+        for message, ciphertext in zip(messages, ciphertexts):
+            self.assertEqual(ciphertext,
+                             Transposition(message, key=8).ciphertext)
+        self.assertEqual(Transposition.permute_batch(ciphertexts, 8,
+                                                     decrypt=True), messages)
+
+
+class Batch_test(unittest.TestCase):
+    ''' Test encrypting and decrypting many records per call. '''
+
+    def test_batch_matches_instances(self):
+        records = [test_message, english_message, 'Non-ASCII é€ passes.']
+        for cipher, key in cipher_keys:
+            ciphertexts = cipher.encrypt_many(records, key)
+            self.assertEqual(ciphertexts, [cipher().encrypt(record, key)
+                                           for record in records])
+            self.assertEqual(cipher.decrypt_many(ciphertexts, key),
+                             [cipher().decrypt(ciphertext, key)
+                              for ciphertext in ciphertexts])
+
+    def test_Transposition_short_records(self):
+        records = ['abc', 'ab', test_message]
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            ciphertexts = Transposition.encrypt_many(records, 3)
+        self.assertEqual(output.getvalue(), '')
+        self.assertNotIn(None, ciphertexts)
+        self.assertEqual(Transposition.decrypt_many(ciphertexts, 3), records)
+
+    def test_Vegenere_long_record(self):
+        message = test_message * (NUMPY_THRESHOLD // len(test_message) + 1)
+        keyed = Vegenere.with_key('LEMON')
+        ciphertext = Vegenere(message, key='LEMON').ciphertext
+        self.assertEqual(keyed(message), ciphertext)
+        self.assertEqual(keyed.decrypt(ciphertext), message)
+
+    def test_key_per_record(self):
+        keys = [3399, 755, 3399]
+        ciphertexts = Affine.encrypt_many([test_message] * 3, keys)
+        self.assertEqual(ciphertexts[1], Affine(test_message, key=755).ciphertext)
+        self.assertEqual(Affine.decrypt_many(ciphertexts, keys),
+                         [test_message] * 3)
+        with self.assertRaises(ValueError):
+            Affine.decrypt_many(ciphertexts, keys[:2])
+
+
+class Keyed_cipher_test(unittest.TestCase):
+    ''' Test reusable, immutable keyed ciphers. '''
+
+    def test_with_key_matches_instances(self):
+        for cipher, key in cipher_keys:
+            keyed = cipher.with_key(key)
+            ciphertext = cipher(test_message, key=key).ciphertext
+            self.assertEqual(keyed(test_message), ciphertext)
+            self.assertEqual(keyed.decrypt(ciphertext),
+                             cipher(ciphertext=ciphertext, key=key).message)
+
+    def test_with_key_is_immutable(self):
+        keyed = Caesar.with_key(8)
+        with self.assertRaises(AttributeError):
+            keyed.key = 9
+        with self.assertRaises(AttributeError):
+            keyed.message = test_message
+        with self.assertRaises(AttributeError):
+            Caesar.with_key(None)
+
+
+class Transposition_crack_test(unittest.TestCase):
+    ''' Test ranking Transposition keys by bigrams at column joins. '''
+
+    def test_Transposition_hack(self):
+        long_message = english_message * 3
+        for key in (9, 200, len(long_message) // 2 - 1):
+            ciphertext = Transposition(long_message, key=key).ciphertext
+            transposition_test = Transposition(ciphertext=ciphertext)
+            self.assertEqual(transposition_test.rank_keys(
+                dictionary=english_words)[0][0], key)
+            self.assertEqual(transposition_test.hack(english_words)[0].key,
+                             key)
+
+    def test_Transposition_hack_large_keys(self):
+        # Keys near a third and a half of the length, where neighbouring
+        # keys decrypt to nearly the same text.
+        for text in (prose_message + sea_message,
+                     sea_message + prose_message):
+            words = set(word.strip(',.;?').upper() for word in text.split())
+            third, last = len(text) // 3, (len(text) + 1) // 2 - 1
+            for key in (third - 1, third, third + 1, last - 1, last):
+                ciphertext = Transposition(text, key=key).ciphertext
+                results = Transposition(ciphertext=ciphertext).hack(words)
+                self.assertEqual(results[0].key, key)
+
+    def test_bigram_boundary_runs(self):
+        # ', ' and '.\n' are common in text but never inside words.
+        bigrams = bigram_log_probs([b'AN', b'AT'])
+        self.assertEqual(bigrams[0], 0.0)
+        self.assertLess(bigram_score('zq qz', bigrams),
+                        bigram_score('an, at.', bigrams))
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed.')
+    def test_Transposition_scores_numpy_matches_python(self):
+        ciphertext = Transposition(english_message * 3, key=9).ciphertext
+        codes = ciphertext.encode('ascii').upper().translate(_BIGRAM_INDEX)
+        bigrams = dictionary_bigrams(english_words)
+        keys = list(Transposition.key_space(ciphertext))
+        step = (len(codes) - 1) // 100
+        numpy_scores = _transposition_scores_numpy(
+            codes, keys, range(0, len(codes) - 1, step)[:100], bigrams)
+        python_scores = [transposition_scores(codes, [key], 100, bigrams)[0]
+                         for key in keys]
+        for numpy_score, python_score in zip(numpy_scores, python_scores):
+            self.assertAlmostEqual(numpy_score, python_score)
+
+
 class Affine_cipher_rand_test(unittest.TestCase):
     ''' Test the Affine cipher with 1000 random keys. '''
 
@@ -84,6 +263,31 @@ class Affine_cipher_rand_test(unittest.TestCase):
             self.assertEqual(affine_test.decrypt(), test_str)
 
 
+class Key_generation_test(unittest.TestCase):
+    ''' Test key generation with injected random number generators. '''
+
+    def test_gen_keys_repeat_with_seed(self):
+        for cipher in (Affine, Substitution):
+            self.assertEqual(cipher.gen_keys(50, random.Random(7)),
+                             cipher.gen_keys(50, random.Random(7)))
+
+    def test_gen_keys_are_valid(self):
+        length = len(Affine.CHARS)
+        for rng in (random.Random(7), random.SystemRandom()):
+            for key in Affine.gen_keys(200, rng):
+                mult_key, add_key = Affine().split_key(key)
+                self.assertEqual(gcd(mult_key, length), 1)
+                self.assertTrue(2 <= mult_key < length and add_key)
+            for key in Substitution.gen_keys(20, rng):
+                self.assertEqual(sorted(key), sorted(Substitution.CHARS))
+
+    def test_Affine_get_key_keeps_key(self):
+        affine_test = Affine(key=3399)
+        self.assertEqual(affine_test.get_key(), 3399)
+        self.assertNotEqual(affine_test.get_key(random.Random(7),
+                                                overwrite=True), None)
+
+
 class Substitution_cipher_rand_test(unittest.TestCase):
     ''' Test the Substitution cipher with 1000 random keys. '''
     def test_Substitution_rand_keys(self):
@@ -93,5 +297,627 @@ class Substitution_cipher_rand_test(unittest.TestCase):
             substitution_test.ciphertext = substitution_test.encrypt()
             self.assertEqual(substitution_test.decrypt(), test_message)
 
+
+class Translation_table_test(unittest.TestCase):
+    ''' Test the cached translation tables used by monoalphabetic ciphers. '''
+
+    def test_table_is_cached(self):
+        self.assertIs(cipher_table(Caesar, 3), cipher_table(Caesar, 3))
+
+    def test_non_alphabet_passes_through(self):
+        self.assertEqual(Caesar().encrypt('abc, xyz! é', 3), 'DEF, ABC! É')
+        self.assertEqual(Affine().encrypt('é€', 3399), 'é€')
+
+
+class Vegenere_backend_test(unittest.TestCase):
+    ''' Test that the NumPy and pure Python Vegenère paths agree. '''
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed.')
+    def test_Vegenere_numpy_matches_python(self):
+        long_message = test_message * 50 + ' é€'
+        for key in ('LEMON', 'k€y', 'Q' * 2000):
+            for sign in (1, -1):
+                self.assertEqual(
+                    vigenere_shift(long_message, key, Vegenere.CHARS, sign),
+                    _vigenere_shift_python(long_message, key,
+                                           Vegenere.CHARS, sign))
+
+    def test_Vegenere_long_message(self):
+        long_message = test_message * 50
+        vegenere_test = Vegenere(long_message, key='LEMON')
+        self.assertEqual(vegenere_test.decrypt(), long_message)
+
+
+class Frequency_rank_test(unittest.TestCase):
+    ''' Test ranking keys by letter frequencies instead of decrypting. '''
+
+    def test_Caesar_rank_keys(self):
+        caesar_test = Caesar(english_message, key=11)
+        self.assertEqual(caesar_test.rank_keys()[0][0], 11)
+
+    def test_Affine_rank_keys(self):
+        for key in (3399, 755, 101):
+            affine_test = Affine(english_message, key=key)
+            self.assertEqual(affine_test.rank_keys()[0][0], key)
+
+    def test_Affine_hack_top(self):
+        affine_test = Affine(ciphertext=Affine(english_message,
+                                               key=3399).ciphertext)
+        results = affine_test.hack(english_words, top=5)
+        self.assertEqual([result.key for result in results], [3399])
+        self.assertEqual(results[0].preview, english_message[:PREVIEW_LENGTH])
+
+
+class Substitution_hack_test(unittest.TestCase):
+    ''' Test hill climbing on quadgrams against a known key. '''
+
+    def test_Substitution_hack(self):
+        # The model must not have seen the plaintext. With this little
+        # training text, most letters come back right, not all.
+        model = QuadgramModel.from_text(english_message + sea_message,
+                                        Substitution.CHARS)
+        message = prose_message[:500]
+        set_key = Substitution.gen_key(random.Random(0))
+        ciphertext = Substitution(message, key=set_key).ciphertext
+        substitution_test = Substitution(ciphertext=ciphertext)
+        results = substitution_test.hack(model, restarts=4, seed=0)
+        attempt = substitution_test.decrypt(passed_key=results[0].key)
+        letters = [(guess, char) for guess, char in zip(attempt, message)
+                   if char.isalpha()]
+        right = sum(guess == char for guess, char in letters)
+        self.assertGreater(right / len(letters), 0.8)
+
+    def test_Substitution_hack_dictionary(self):
+        # Without a model, one is trained on the dictionary passed in.
+        words = set(word.strip(',.;').upper() for word in
+                    (english_message + sea_message).split())
+        message = prose_message[:500]
+        ciphertext = Substitution(
+            message, key=Substitution.gen_key(random.Random(0))).ciphertext
+        results = Substitution(ciphertext=ciphertext).hack(
+            seed=0, dictionary=words)
+        decrypted = Substitution(ciphertext=ciphertext,
+                                 key=results[0].key).message
+        letters = [(plain, char) for plain, char in zip(message, decrypted)
+                   if plain.isalpha()]
+        right = sum(plain == char for plain, char in letters)
+        self.assertGreater(right / len(letters), 0.8)
+
+    def test_QuadgramModel_save_load(self):
+        model = QuadgramModel.from_text(english_message)
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, 'english.hcq')
+            model.save(file_name)
+            loaded = QuadgramModel.load(file_name)
+        self.assertEqual(loaded.alphabet, model.alphabet)
+        self.assertEqual(loaded.unigrams, model.unigrams)
+        self.assertEqual(loaded.quadgrams, model.quadgrams)
+
+
+class Vegenere_hack_test(unittest.TestCase):
+    ''' Test key length detection and per-column frequency solving. '''
+
+    def test_Vegenere_key_lengths(self):
+        ciphertext = Vegenere(english_message, key='LEMON').ciphertext
+        self.assertEqual(Vegenere.key_lengths(ciphertext)[0], 5)
+
+    def test_Vegenere_hack(self):
+        ciphertext = Vegenere(english_message, key='LEMON').ciphertext
+        vegenere_test = Vegenere(ciphertext=ciphertext)
+        self.assertEqual(vegenere_test.rank_keys()[0][0], 'LEMON')
+        self.assertEqual(vegenere_test.hack(english_words)[0].key, 'LEMON')
+
+
+class Crib_test(unittest.TestCase):
+    ''' Test reading keys from known plaintext. '''
+
+    def test_Caesar_and_Affine_crib(self):
+        ciphertext = Caesar(english_message, key=11).ciphertext
+        self.assertEqual(Caesar.solve_crib(ciphertext, 'It was', 0),
+                         [(0, 11)])
+        self.assertEqual(Caesar.solve_crib(ciphertext, 'the season of'),
+                         [(204, 11), (245, 11)])
+        ciphertext = Affine(english_message, key=3399).ciphertext
+        self.assertEqual(Affine.solve_crib(ciphertext, 'It was', 0),
+                         [(0, 3399)])
+        self.assertEqual(Affine.solve_crib(ciphertext, 'the season of'),
+                         [(204, 3399), (245, 3399)])
+        self.assertEqual(Affine.solve_crib(ciphertext, 'It was', 1), [])
+
+    def test_Vegenere_crib(self):
+        ciphertext = Vegenere(english_message, key='LEMON').ciphertext
+        self.assertEqual(''.join(Vegenere.crib_fragment(ciphertext,
+                                                        'best', 11)), 'EMON')
+        self.assertEqual(Vegenere.solve_crib(ciphertext, 'the season of'),
+                         [(204, 'LEMON'), (245, 'LEMON')])
+        self.assertEqual(Vegenere.solve_crib(ciphertext, 'the season of',
+                                             max_length=4), [])
+
+    def test_Substitution_crib(self):
+        key = Substitution.gen_key(random.Random(1))
+        ciphertext = Substitution(english_message, key=key).ciphertext
+        solutions = Substitution.solve_crib(ciphertext, 'the season of')
+        self.assertEqual([offset for offset, _ in solutions], [204, 245])
+        for plain, cipher in solutions[0][1].items():
+            self.assertEqual(key[Substitution.CHARS.index(plain)], cipher)
+
+
+class Hack_cache_test(unittest.TestCase):
+    ''' Test caching hack results in memory and in sqlite3. '''
+
+    def test_sqlite3_is_optional(self):
+        # Block sqlite3, as in a Python built without it.
+        code = ('import sys; sys.modules["sqlite3"] = None; '
+                'import historical_ciphers as h; '
+                'print(h.Caesar("abc", key=3).ciphertext, len(h.HackCache()))')
+        output = subprocess.run([sys.executable, '-c', code],
+                                capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(output.stdout, 'DEF 0\n')
+
+    def test_memory_cache(self):
+        cache = HackCache(max_entries=2)
+        ciphertexts = [Affine(english_message, key=key).ciphertext
+                       for key in (3399, 755, 101)]
+        first = Affine(ciphertext=ciphertexts[0]).hack(english_words,
+                                                       cache=cache)
+        again = Affine(ciphertext=ciphertexts[0]).hack(english_words,
+                                                       cache=cache)
+        self.assertEqual(first, again)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        # A different option or dictionary is a different entry.
+        Affine(ciphertext=ciphertexts[0]).hack(english_words, top=5,
+                                               cache=cache)
+        Affine(ciphertext=ciphertexts[0]).hack(english_words | {'CIPHER'},
+                                               cache=cache)
+        self.assertEqual(cache.misses, 3)
+        self.assertEqual(len(cache), 2)
+
+    def test_disk_cache(self):
+        ciphertext = Vegenere(english_message, key='LEMON').ciphertext
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'hacks.sqlite3')
+            cache = HackCache(path=path)
+            first = Vegenere(ciphertext=ciphertext).hack(english_words,
+                                                         cache=cache)
+            cache.close()
+            cache = HackCache(path=path)
+            again = Vegenere(ciphertext=ciphertext).hack(english_words,
+                                                         cache=cache)
+            cache.close()
+        self.assertEqual(first, again)
+        self.assertEqual(cache.stats()['disk_hits'], 1)
+
+    def test_table_cache_info(self):
+        Affine(test_message, key=3399)
+        self.assertIn('mod_inverse', table_cache_info())
+        self.assertGreater(table_cache_info()['cipher_table']['hits'] +
+                           table_cache_info()['cipher_table']['misses'], 0)
+
+
+class Key_search_test(unittest.TestCase):
+    ''' Test serial and process-pool key-space search. '''
+
+    def test_Affine_search_serial_and_parallel(self):
+        ciphertext = Affine(english_message, key=3399).ciphertext
+        for workers in (None, 2):
+            matches = list(search_keys(Affine, ciphertext, english_words,
+                                       workers=workers))
+            self.assertEqual(matches, [(3399, english_message)])
+
+    def test_search_stats(self):
+        ciphertext = Affine(english_message, key=3399).ciphertext
+        for workers in (None, 2):
+            reports = []
+            stats = HackStats(callback=reports.append)
+            results = Affine(ciphertext=ciphertext).hack(
+                english_words, workers=workers, stats=stats)
+            self.assertEqual([result.key for result in results], [3399])
+            self.assertEqual(stats.keys_tried,
+                             len(Affine.key_space(ciphertext)))
+            self.assertEqual(stats.matches, 1)
+            self.assertGreater(stats.decrypt_seconds, 0)
+            self.assertGreater(stats.score_seconds, 0)
+            self.assertGreater(stats.keys_per_second, 0)
+            self.assertIs(reports[-1], stats)
+
+    def test_early_exit_on_long_ciphertext(self):
+        long_message = english_message * 5
+        ciphertext = Affine(long_message, key=3399).ciphertext
+        stats = HackStats()
+        results = Affine(ciphertext=ciphertext).hack(english_words,
+                                                     stats=stats,
+                                                     early_exit=True)
+        self.assertEqual([result.key for result in results], [3399])
+        self.assertGreater(stats.early_rejections,
+                           stats.keys_tried * 9 // 10)
+
+    def test_early_exit_is_opt_in(self):
+        # The whole text passes is_language(), but its opening does not.
+        header = ' '.join('{:09d}'.format(n * 7919) for n in range(10))
+        message = header + '\n' + (english_message * 5)[:1200]
+        ciphertext = Affine(message, key=3399).ciphertext
+        self.assertTrue(is_language(message, english_words))
+        stats = HackStats()
+        results = Affine(ciphertext=ciphertext).hack(english_words,
+                                                     stats=stats)
+        self.assertEqual([result.key for result in results], [3399])
+        self.assertEqual(stats.early_rejections, 0)
+        self.assertEqual(Affine(ciphertext=ciphertext).hack(
+            english_words, early_exit=True), [])
+
+    def test_decrypt_prefix(self):
+        for cipher, key in cipher_keys:
+            ciphertext = cipher(test_message, key=key).ciphertext
+            self.assertEqual(cipher().decrypt_prefix(ciphertext, 50, key),
+                             cipher().decrypt(ciphertext, key)[:50])
+
+    def test_Transposition_search_max_matches(self):
+        ciphertext = Transposition(english_message, key=9).ciphertext
+        matches = list(search_keys(Transposition, ciphertext, english_words,
+                                   workers=2, chunk_size=10, max_matches=1))
+        self.assertEqual(matches, [(9, english_message)])
+
+
+class Service_test(unittest.TestCase):
+    ''' Test the asyncio job layer through an in-process server. '''
+
+    def run_with_client(self, test, **manager_args):
+        async def main():
+            manager = service.JobManager(english_words, **manager_args)
+            server = await service.serve(manager)
+            client = await service.Client.connect(
+                port=server.sockets[0].getsockname()[1])
+            try:
+                await test(client)
+            finally:
+                await client.close()
+                server.close()
+                await server.wait_closed()
+        asyncio.run(main())
+
+    def test_encrypt_decrypt(self):
+        async def test(client):
+            ciphertext = await client.encrypt('Vegenere', test_message,
+                                              'LEMON')
+            self.assertEqual(ciphertext,
+                             Vegenere(test_message, key='LEMON').ciphertext)
+            self.assertEqual(await client.decrypt('Vegenere', ciphertext,
+                                                  'LEMON'), test_message)
+            with self.assertRaises(ValueError):
+                await client.encrypt('Enigma', test_message, 1)
+        self.run_with_client(test)
+
+    def test_bad_requests(self):
+        async def main():
+            manager = service.JobManager(english_words)
+            server = await service.serve(manager)
+            reader, writer = await asyncio.open_connection(
+                port=server.sockets[0].getsockname()[1])
+            try:
+                writer.write(b'not json\n[1, 2]\n{"id": 3, "op": "cancel", '
+                             b'"job": 9}\n')
+                responses = [json.loads(await reader.readline())
+                             for _ in range(3)]
+            finally:
+                writer.close()
+                server.close()
+                await server.wait_closed()
+            return responses
+        responses = sorted(asyncio.run(main()),
+                           key=lambda response: response['id'] or 0)
+        self.assertEqual([response['type'] for response in responses],
+                         ['error', 'error', 'result'])
+        self.assertEqual(responses[2], {'id': 3, 'type': 'result',
+                                        'cancelled': False})
+
+    def test_crack_streams_candidates(self):
+        ciphertext = Affine(english_message, key=3399).ciphertext
+
+        async def test(client):
+            events = [event async for event in client.crack('Affine',
+                                                            ciphertext)]
+            self.assertEqual(events[0]['type'], 'job')
+            self.assertEqual(events[-1]['type'], 'done')
+            candidates = [event for event in events
+                          if event['type'] == 'candidate']
+            self.assertEqual([event['key'] for event in candidates], [3399])
+            self.assertEqual(candidates[0]['preview'],
+                             english_message[:PREVIEW_LENGTH])
+            self.assertGreater(candidates[0]['score'], 0.9)
+            progress = [event for event in events
+                        if event['type'] == 'progress']
+            self.assertEqual(progress[-1]['tried'],
+                             len(Affine.key_space(ciphertext)))
+        self.run_with_client(test)
+
+    def test_crack_uses_hack_limits(self):
+        message = english_message * 25
+        ciphertext = Transposition(message, key=1000).ciphertext
+
+        async def main():
+            manager = service.JobManager(english_words)
+            job = manager.submit(Transposition, ciphertext)
+            results = await job.wait()
+            return job.state, job.tried, results
+        state, tried, results = asyncio.run(main())
+        self.assertEqual(state, 'done')
+        self.assertEqual(results[0].key, 1000)
+        self.assertEqual(results[0].preview, message[:PREVIEW_LENGTH])
+        self.assertLess(tried, 50)
+
+    def test_cancel_crack(self):
+        ciphertext = Transposition(english_message * 20, key=9).ciphertext
+
+        async def test(client):
+            events = client.crack('Transposition', ciphertext, top=None)
+            job_id = (await events.__anext__())['job']
+            self.assertTrue(await client.cancel(job_id))
+            remaining = [event['type'] async for event in events]
+            self.assertEqual(remaining[-1], 'cancelled')
+        self.run_with_client(test)
+
+    def test_process_pool_executor(self):
+        ciphertext = Affine(english_message, key=3399).ciphertext
+
+        async def main():
+            with ProcessPoolExecutor(max_workers=2) as executor:
+                manager = service.JobManager(english_words, executor=executor)
+                try:
+                    job = manager.submit(Affine, ciphertext)
+                    results = await job.wait()
+                finally:
+                    manager.close()
+            return job.state, job.tried, [result.key for result in results]
+        state, tried, keys = asyncio.run(main())
+        self.assertEqual((state, keys), ('done', [3399]))
+        self.assertEqual(tried, len(Affine.key_space(ciphertext)))
+
+    def test_Substitution_uses_manager_dictionary(self):
+        ciphertext = Substitution(english_message, key=substitution_key
+                                  ).ciphertext
+
+        async def main():
+            manager = service.JobManager(english_words)
+            job = manager.submit(Substitution, ciphertext,
+                                 {'restarts': 2, 'seed': 0})
+            results = await job.wait()
+            return job.state, job.tried, results
+        state, tried, results = asyncio.run(main())
+        self.assertEqual((state, tried), ('done', 3))
+        self.assertTrue(results)
+        for result in results:
+            self.assertEqual(sorted(result.key), sorted(Substitution.CHARS))
+            self.assertEqual(result.preview, Substitution(
+                ciphertext=ciphertext, key=result.key).message[
+                    :PREVIEW_LENGTH])
+
+    def test_cached_crack(self):
+        ciphertext = Affine(english_message, key=3399).ciphertext
+        cache = HackCache()
+
+        async def main():
+            manager = service.JobManager(english_words, cache=cache)
+            first = await manager.submit(Affine, ciphertext, {'top': 5}).wait()
+            second = manager.submit(Affine, ciphertext, {'top': 5})
+            return first, await second.wait(), second.tried
+        first, second, tried = asyncio.run(main())
+        self.assertEqual(first, second)
+        self.assertEqual(tried, 0)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+
+class Cli_test(unittest.TestCase):
+    ''' Test the command line tool on a directory of files. '''
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.inputs = os.path.join(self.directory.name, 'in')
+        os.makedirs(os.path.join(self.inputs, 'sub'))
+        self.messages = {'a.txt': english_message,
+                         os.path.join('sub', 'b.txt'): english_message * 2}
+        for name, message in self.messages.items():
+            with open(os.path.join(self.inputs, name), 'w') as fo:
+                fo.write(message)
+        self.dictionary = os.path.join(self.directory.name, 'dictionary.txt')
+        with open(self.dictionary, 'w') as fo:
+            fo.write('\n'.join(english_words))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read_outputs(self, name):
+        outputs = {}
+        for message_name in self.messages:
+            with open(os.path.join(self.directory.name, name,
+                                   message_name)) as fo:
+                outputs[message_name] = fo.read()
+        return outputs
+
+    def test_encrypt_decrypt_directory(self):
+        encrypted = os.path.join(self.directory.name, 'encrypted')
+        decrypted = os.path.join(self.directory.name, 'decrypted')
+        self.assertEqual(cli.main(['encrypt', '-c', 'vegenere', '-k', 'LEMON',
+                                   self.inputs, '-o', encrypted]), 0)
+        self.assertEqual(self.read_outputs('encrypted')['a.txt'],
+                         Vegenere(english_message, key='LEMON').ciphertext)
+        self.assertEqual(cli.main(['decrypt', '-c', 'vegenere', '-k', 'LEMON',
+                                   encrypted, '-o', decrypted, '-w', '2']), 0)
+        self.assertEqual(self.read_outputs('decrypted'), self.messages)
+
+    def test_crack_directory(self):
+        encrypted = os.path.join(self.directory.name, 'encrypted')
+        cli.main(['encrypt', '-c', 'affine', '-k', '3399', self.inputs,
+                  '-o', encrypted, '-w', '1'])
+        with contextlib.redirect_stderr(io.StringIO()) as notes:
+            self.assertEqual(cli.main(['crack', '-c', 'affine',
+                                       '-d', self.dictionary, encrypted,
+                                       '-o', os.path.join(self.directory.name,
+                                                          'cracked')]), 0)
+        self.assertIn('key 3399', notes.getvalue())
+        self.assertEqual(self.read_outputs('cracked'), self.messages)
+
+    def test_crack_Substitution_with_dictionary(self):
+        ciphertext = Substitution(english_message[:80],
+                                  key=Substitution.CHARS[::-1]).ciphertext
+        output, note, ok = cli.run('crack', Substitution, None, ciphertext,
+                                   self.dictionary)
+        self.assertTrue(ok)
+        self.assertTrue(note.startswith('key '))
+
+    def test_crack_missing_files(self):
+        missing = os.path.join(self.directory.name, 'missing.txt')
+        for cipher, option in (('affine', '-d'), ('substitution', '-d'),
+                               ('substitution', '-m')):
+            with contextlib.redirect_stderr(io.StringIO()) as notes, \
+                    self.assertRaises(SystemExit) as exit:
+                cli.main(['crack', '-c', cipher, option, missing,
+                          self.inputs])
+            self.assertEqual(exit.exception.code, 2)
+            self.assertIn('cannot read ' + missing, notes.getvalue())
+
+    def test_affine_multiplier_one(self):
+        self.assertEqual(cli.run('encrypt', Affine, 150, test_message),
+                         (Affine(test_message, key=150).ciphertext, None,
+                          True))
+
+    def test_non_integer_key(self):
+        with contextlib.redirect_stderr(io.StringIO()) as notes, \
+                self.assertRaises(SystemExit) as exit:
+            cli.main(['encrypt', '-c', 'caesar', '-k', 'LEMON', self.inputs])
+        self.assertEqual(exit.exception.code, 2)
+        self.assertIn('must be an integer', notes.getvalue())
+
+    def test_bad_key_keeps_stdout_clean(self):
+        source = os.path.join(self.inputs, 'a.txt')
+        for cipher, key in (('transposition', str(len(english_message))),
+                            ('affine', '26')):
+            with contextlib.redirect_stdout(io.StringIO()) as output, \
+                    contextlib.redirect_stderr(io.StringIO()) as notes:
+                self.assertEqual(cli.main(['encrypt', '-c', cipher, '-k', key,
+                                           source]), 1)
+            self.assertEqual(output.getvalue(), '')
+            self.assertIn('cannot encrypt with key', notes.getvalue())
+
+
+class Stream_test(unittest.TestCase):
+    ''' Test that chunked streaming matches whole-message encryption. '''
+
+    def test_streams_match_whole_message(self):
+        for cipher, key in stream_keys:
+            whole = cipher(test_message, key=key).ciphertext
+            encrypted = io.StringIO()
+            cipher(key=key).encrypt_stream(io.StringIO(test_message),
+                                           encrypted, chunk_size=7)
+            self.assertEqual(encrypted.getvalue(), whole)
+            chunks = [whole[start:start + 13]
+                      for start in range(0, len(whole), 13)]
+            self.assertEqual(''.join(cipher(key=key).iter_decrypt(chunks)),
+                             cipher(ciphertext=whole, key=key).message)
+
+    def test_Transposition_cannot_stream(self):
+        with self.assertRaises(NotImplementedError):
+            list(Transposition(key=8).iter_encrypt([test_message]))
+
+
+class Bytes_mode_test(unittest.TestCase):
+    ''' Test bytes mode against str encryption, copying and in place. '''
+
+    def test_bytes_match_str(self):
+        data = test_message.encode('ascii')
+        for cipher, key in stream_keys:
+            ciphertext = cipher(test_message, key=key).ciphertext
+            self.assertEqual(cipher(key=key).encrypt_bytes(data),
+                             ciphertext.encode('ascii'))
+            buffer = bytearray(ciphertext.encode('ascii'))
+            cipher(key=key).decrypt_into(memoryview(buffer))
+            self.assertEqual(buffer.decode('ascii'),
+                             cipher(ciphertext=ciphertext, key=key).message)
+
+    def test_mmap_in_place(self):
+        data = test_message.encode('ascii')
+        with tempfile.TemporaryFile() as fo:
+            fo.write(data)
+            fo.flush()
+            with mmap.mmap(fo.fileno(), 0, access=mmap.ACCESS_WRITE) as mapped:
+                for cipher, key in stream_keys:
+                    mapped[:] = data
+                    encrypted = cipher(key=key).encrypt_bytes(data)
+                    cipher(key=key).encrypt_into(mapped)
+                    self.assertEqual(mapped[:], encrypted)
+                    cipher(key=key).decrypt_into(mapped)
+                    self.assertEqual(mapped[:], cipher(key=key).decrypt_bytes(
+                        encrypted))
+                mapped.flush()
+                contents = mapped[:]
+            fo.seek(0)
+            self.assertEqual(fo.read(), contents)
+
+    def test_non_ascii_bytes_pass_through(self):
+        self.assertEqual(Caesar(key=3).encrypt_bytes(b'abc\xe9'), b'DEF\xe9')
+
+
+class Compiled_dictionary_test(unittest.TestCase):
+    ''' Test that a compiled dictionary answers like the set it replaces. '''
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        source = os.path.join(self.directory.name, 'dictionary.txt')
+        self.compiled = os.path.join(self.directory.name, 'dictionary.hcd')
+        with open(source, 'w') as fo:
+            fo.write('\n'.join(english_words) + '\n')
+        compile_dictionary(source, self.compiled)
+        self.plain = load_dictionary(source)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_load_compiled_dictionary(self):
+        compiled = load_dictionary(self.compiled)
+        self.assertIsInstance(compiled, CompiledDictionary)
+        self.assertEqual(len(compiled), len(english_words))
+        for word in english_words:
+            self.assertIn(word, compiled)
+            self.assertIn(word.encode('ascii'), compiled)
+        self.assertNotIn('CIPHER', compiled)
+        compiled.close()
+
+    def test_is_language_matches_set(self):
+        compiled = load_dictionary(self.compiled)
+        candidates = [english_message, test_message, 'zq xv', 'é age of',
+                      Caesar(english_message, key=3).ciphertext]
+        for candidate in candidates:
+            self.assertEqual(is_language(candidate, compiled),
+                             is_language(candidate, self.plain))
+        self.assertTrue(is_language(english_message, compiled))
+        compiled.close()
+
+    def test_skips_non_ascii_words(self):
+        source = os.path.join(self.directory.name, 'accents.txt')
+        with open(source, 'w', encoding='utf-8') as fo:
+            fo.write('café\nnaïve\ntea\n')
+        compile_dictionary(source, self.compiled)
+        compiled = load_dictionary(self.compiled)
+        self.assertEqual(list(compiled), ['TEA'])
+        for word in ('CAF', 'NAVE', 'CAFÉ'):
+            self.assertNotIn(word, compiled)
+        compiled.close()
+
+    def test_iterate_and_score(self):
+        compiled = load_dictionary(self.compiled)
+        self.assertEqual(list(compiled), sorted(self.plain - {''}))
+        self.assertEqual(compiled.words,
+                         {word.encode('ascii') for word in self.plain} - {b''})
+        self.assertEqual(compiled.ngram_score(english_message),
+                         bigram_score(english_message,
+                                      dictionary_bigrams(self.plain)))
+        self.assertGreater(compiled.ngram_score(english_message),
+                           compiled.ngram_score(
+                               Caesar(english_message, key=3).ciphertext))
+        model = QuadgramModel.from_text(' '.join(compiled))
+        self.assertIsInstance(model, QuadgramModel)
+        compiled.close()
+
+
 if __name__ == '__main__':
     unittest.main()
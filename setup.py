@@ -1,4 +1,4 @@
-from distutils.core import setup
+from setuptools import setup
 
 setup(
     name = 'historical_ciphers',
@@ -11,4 +11,10 @@ setup(
     download_url = 'https://github.com/jake-jake-jake/historical_ciphers/tarball/0.1',
     keywords = ['ciphers', 'cryptography', 'history'], # arbitrary keywords
     classifiers = [],
-)
\ No newline at end of file
+    extras_require = {'numpy': ['numpy']},
+    entry_points = {
+        'console_scripts': [
+            'historical-ciphers = historical_ciphers.cli:main',
+        ],
+    },
+)